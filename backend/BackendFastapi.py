@@ -2124,17 +2124,6 @@ async def create_index_endpoint(request: Request):
 
     def job_orchestrator():
         """Discovers companies and launches a worker thread for each."""
-        # Define the central output file
-        output_file_path = os.path.join(
-            project_root, "backend", "indexing_results.json"
-        )
-        # Create a shared lock for file access
-        file_lock = threading.RLock()
-
-        # Clear the old results file at the start of a new job
-        if os.path.exists(output_file_path):
-            os.remove(output_file_path)
-
         def status_callback(message):
             # Add a timestamp to the message for clearer logging on the server
             print(f"[INDEXING_STATUS] {message}")
@@ -2171,8 +2160,6 @@ async def create_index_endpoint(request: Request):
                     args=(
                         company_name,
                         index_name,
-                        output_file_path,
-                        file_lock,
                         status_callback,
                     ),
                 )
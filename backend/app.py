@@ -2,15 +2,83 @@ import os
 import json
 import uuid
 import hashlib
+import re
 import time
 from datetime import datetime
-from flask import Flask, jsonify, request, stream_with_context, Response, send_file
+from flask import Flask, jsonify, request, stream_with_context, Response
 from flask_cors import CORS
 from qdrant_client import QdrantClient
-from qdrant_client.models import Filter, FieldCondition, MatchValue
+from qdrant_client.models import Filter, FieldCondition, MatchValue, MatchAny, PayloadSelectorInclude, PayloadSchemaType, PointIdsList
 import threading
+import queue
 import traceback # Import the traceback module
-from concurrent.futures import ThreadPoolExecutor
+import functools
+import logging
+import logging.handlers
+import sys
+import mmap
+import shutil
+import urllib.parse
+import base64
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+try:
+    from fastrlock.rlock import FastRLock
+except ImportError:  # fastrlock is optional; fall back to threading.RLock
+    FastRLock = threading.RLock
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:  # OpenCV is optional; fall back to PyMuPDF's own JPEG encoder
+    cv2 = None
+
+try:
+    import pybase64
+except ImportError:  # pybase64 is optional; fall back to binascii
+    pybase64 = None
+
+
+def _emit(data):
+    """Encode one progress event as a newline-terminated JSON line (bytes)."""
+    if orjson is not None:
+        return orjson.dumps(data) + b"\n"
+    return (json.dumps(data) + "\n").encode("utf-8")
+
+
+def _dumps(data):
+    """Encode data as a compact JSON str, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(data).decode("utf-8")
+    return json.dumps(data, separators=(",", ":"))
+
+# Files at least this large are parsed from an mmap instead of a read() copy
+MMAP_JSON_MIN_BYTES = 64 * 1024
+
+def load_json_file(path):
+    """Parse a JSON file; large files are mapped and parsed in place when orjson is available."""
+    with open(path, 'rb') as f:
+        if orjson is not None and os.fstat(f.fileno()).st_size >= MMAP_JSON_MIN_BYTES:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                return orjson.loads(view)
+        return _loads(f.read())
+
+def json_response(data):
+    """Like jsonify(data), but encoded with orjson when available (large responses)."""
+    if orjson is not None:
+        return Response(orjson.dumps(data), mimetype="application/json")
+    return jsonify(data)
+
+def _loads(raw):
+    """Parse JSON from str or bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
 
 
 
@@ -30,31 +98,66 @@ CORS(app)  # Enable CORS for all routes
 MAX_CONCURRENT_JOBS = 30
 job_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_JOBS, thread_name_prefix="DocProcessor")
 
+# /api/create-index orchestrators run here instead of on a fresh thread per request;
+# each job fans out to its own INDEXING_WORKERS pool, so only a few run at once
+MAX_CONCURRENT_INDEX_JOBS = 4
+index_job_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_INDEX_JOBS, thread_name_prefix="IndexJob")
+
+# Removes deleted companies' OCR cache trees off the request thread
+cleanup_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="CacheCleanup")
+
 # Track active and queued jobs
 active_jobs = set()  # Currently processing company IDs
 active_jobs_lock = threading.Lock()
 
+# Uploaded PDFs live in knowledge/<company>/<file>
+KNOWLEDGE_DIR = os.path.join(project_root, "knowledge")
+
 # OCR Cache Configuration
 OCR_CACHE_DIR = os.path.join(project_root, "backend", "ocr_cache")
 os.makedirs(OCR_CACHE_DIR, exist_ok=True)
 
+# Deleted companies' OCR cache trees are renamed into this sibling of OCR_CACHE_DIR
+# (same filesystem, so the rename is atomic) and removed from there in the background;
+# nothing that lists companies in ocr_cache/ ever sees them
+OCR_CACHE_TRASH_DIR = os.path.join(project_root, "backend", "ocr_cache_trash")
+os.makedirs(OCR_CACHE_TRASH_DIR, exist_ok=True)
+# Finish removing any that were left behind by a restart mid-delete
+with os.scandir(OCR_CACHE_TRASH_DIR) as _entries:
+    for _entry in _entries:
+        cleanup_executor.submit(shutil.rmtree, _entry.path, ignore_errors=True)
+
+# Characters not allowed in cache directory names
+_UNSAFE_FILENAME_RE = re.compile(r'[\\/*?:"<>|]')
+
+@functools.lru_cache(maxsize=1024)
+def get_company_cache_dir(company_id):
+    """Returns the OCR cache directory for a company (pure; does not create it)."""
+    return os.path.join(OCR_CACHE_DIR, _UNSAFE_FILENAME_RE.sub("_", company_id))
+
 def get_ocr_cache_path(company_id, source_name):
     """Constructs the path for an OCR cache file, creating subdirs as needed."""
-    import re
-    safe_company_id = re.sub(r'[\\/*?:"<>|]', "_", company_id)
-    
-    company_cache_dir = os.path.join(OCR_CACHE_DIR, safe_company_id)
+    # Not cached as a whole: the directory may have been removed by a company delete
+    company_cache_dir = get_company_cache_dir(company_id)
     os.makedirs(company_cache_dir, exist_ok=True)
     
     return os.path.join(company_cache_dir, f"{source_name}.json")
 
-# Global lock for thread-safe operations on the processing state
-processing_lock = threading.RLock()
+# Global lock for thread-safe operations on the processing state.
+# Must stay reentrant: load/save_processing_states take it and are called from
+# inside callers' own `with processing_lock:` read-modify-write blocks.
+# FastRLock (C, tuned for the uncontended case) when fastrlock is installed.
+processing_lock = FastRLock()
 
 # No file-based logging - pure RAM storage only
 
 def generate_document_id(company_id, file_name):
-    """Generate a unique document ID based on company name and file name (deterministic)"""
+    """
+    Generate a unique document ID based on company name and file name (deterministic).
+    Keep this SHA-1 based: the ID is stored as metadata.doc_id in Qdrant and seeds the
+    UUIDv5 point IDs, so changing the hash would make re-processed documents create
+    duplicate points instead of overwriting the existing ones.
+    """
     combined = f"{company_id}:{file_name}"
     return hashlib.sha1(combined.encode()).hexdigest()[:16]
 
@@ -64,11 +167,10 @@ def load_processing_states(company_id):
     Returns all document states that belong to this company.
     """
     with processing_lock:
-        # Filter states by company_id
+        # Look up this company's documents via the index instead of scanning all states
         company_states = {
-            doc_id: state.copy()  # Return copy to prevent external modification
-            for doc_id, state in processing_states_memory.items()
-            if state.get('company_id') == company_id
+            doc_id: processing_states_memory[doc_id].copy()  # Return copy to prevent external modification
+            for doc_id in company_doc_ids.get(company_id, ())
         }
         return company_states
 
@@ -88,10 +190,105 @@ def save_processing_states(company_id, states):
             if 'company_id' not in state:
                 state['company_id'] = company_id
             processing_states_memory[doc_id] = state
+            company_doc_ids.setdefault(state['company_id'], set()).add(doc_id)
         
         # Notify listeners of update via SSE
         notify_processing_update({"type": "states_updated", "states": states})
 
+# Per-page OCR progress is applied to processing_states_memory in place and only
+# broadcast to SSE listeners every STATES_FLUSH_INTERVAL seconds (or on terminal
+# events), instead of copying + re-broadcasting the whole company twice per page.
+STATES_FLUSH_INTERVAL = 2.0
+_dirty_companies = set()
+_last_flush = {}
+
+def patch_state(doc_id, patch, sub_path=None):
+    """
+    Apply patch to a single document state in memory without copying or broadcasting.
+    With sub_path (e.g. ("steps", "ocr")) the patch is applied to that nested dict,
+    creating it if needed. Returns False if the document has no state.
+    The owning company is marked dirty so _maybe_flush() can broadcast it later.
+    """
+    with processing_lock:
+        target = processing_states_memory.get(doc_id)
+        if target is None:
+            return False
+        company_id = target.get("company_id")
+        for key in sub_path or ():
+            target = target.setdefault(key, {})
+        target.update(patch)
+        _dirty_companies.add(company_id)
+        return True
+
+def update_document_state(doc_id, updates, step=None):
+    """
+    Apply updates to a single document state in memory without broadcasting.
+    If step is given and already started, the same updates are mirrored into
+    state["steps"][step].
+    """
+    with processing_lock:
+        if not patch_state(doc_id, updates):
+            return
+        if step and step in processing_states_memory[doc_id].get("steps", {}):
+            patch_state(doc_id, updates, sub_path=("steps", step))
+
+def log_document_event(doc_id, message, status, updates=None, **extra):
+    """
+    Set a document's current message (plus any other updates) and append a log
+    entry, in place and without broadcasting. Extra keyword arguments (step,
+    error, ...) are added to the log entry. Returns False if the document has
+    no state.
+    """
+    entry = {"timestamp": time.time(), "message": message, "status": status, **extra}
+    with processing_lock:
+        if not patch_state(doc_id, {"message": message, **(updates or {})}):
+            return False
+        processing_states_memory[doc_id].setdefault("logs", []).append(entry)
+        return True
+
+def record_step_start(doc_id, step, message):
+    """
+    Mark a pipeline step as started for a document: create steps[step], set the
+    document's message and log it, all under one lock acquisition.
+    """
+    now = time.time()
+    with processing_lock:
+        state = processing_states_memory.get(doc_id)
+        if state is None:
+            return False
+        state.setdefault("steps", {})[step] = {
+            "current_step": step,
+            "message": message,
+            "start_time": now
+        }
+        state["message"] = message
+        state.setdefault("logs", []).append({
+            "timestamp": now,
+            "message": message,
+            "status": "step_started",
+            "step": step
+        })
+        _dirty_companies.add(state.get("company_id"))
+        return True
+
+def _maybe_flush(company_id, force=False):
+    """
+    Broadcast a company's dirty states to SSE listeners, debounced to at most
+    once per STATES_FLUSH_INTERVAL seconds unless force=True.
+    There is no trailing flush for skipped calls, so step transitions and other
+    one-off changes the UI must see have to pass force=True.
+    """
+    with processing_lock:
+        if company_id not in _dirty_companies:
+            return
+        now = time.time()
+        if not force and now - _last_flush.get(company_id, 0) < STATES_FLUSH_INTERVAL:
+            return
+        _dirty_companies.discard(company_id)
+        _last_flush[company_id] = now
+        states = load_processing_states(company_id)
+    notify_processing_update({"type": "states_updated", "states": states})
+
 def cleanup_processing_state(doc_id):
     """
     Remove a processing state from memory when processing is complete.
@@ -103,6 +300,11 @@ def cleanup_processing_state(doc_id):
     with processing_lock:
         removed = processing_states_memory.pop(doc_id, None)
         if removed:
+            doc_ids = company_doc_ids.get(removed.get('company_id'))
+            if doc_ids is not None:
+                doc_ids.discard(doc_id)
+                if not doc_ids:
+                    del company_doc_ids[removed.get('company_id')]
             print(f"🗑️  CLEANED UP: {doc_id} | Memory freed")
         return removed
 
@@ -116,6 +318,10 @@ def cleanup_processing_state(doc_id):
 # Structure: {doc_id: {state_data}}
 processing_states_memory = {}
 
+# Secondary index {company_id: set(doc_id)} so per-company lookups are
+# O(company's documents) rather than a scan over every company's states
+company_doc_ids = {}
+
 # Note: processing_lock is already defined above (line 51) and will be reused
 # for thread-safe access to processing_states_memory
 
@@ -130,41 +336,127 @@ QDRANT_COLLECTION = os.getenv('QDRANT_COLLECTION')
 DEKA_BASE = os.getenv("DEKA_BASE_URL")
 DEKA_KEY = os.getenv("DEKA_KEY")
 OCR_MODEL = "meta/llama-4-maverick-instruct"
+EMBED_MODEL = os.getenv("EMBED_MODEL", "baai/bge-multilingual-gemma2")
+
+# Pipeline tuning, read once at import so a running upload never sees a mid-job change
+# Render scale for OCR page images; pixel count grows with the square of this
+OCR_ZOOM = float(os.getenv("OCR_ZOOM", "3.0"))
+OCR_JPEG_QUALITY = 80
+# Number of pages sent to the OCR service concurrently per document
+OCR_CONCURRENCY = int(os.getenv("OCR_CONCURRENCY", "6"))
+# Number of files of one upload job run through the pipeline concurrently
+FILE_CONCURRENCY = int(os.getenv("FILE_CONCURRENCY", "2"))
+# Chunks per embedding request and points per Qdrant upsert. BATCH_SIZE is the
+# older single setting and is still honoured for both when set.
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", os.getenv("BATCH_SIZE", "256")))
+QDRANT_BATCH_SIZE = int(os.getenv("QDRANT_BATCH_SIZE", os.getenv("BATCH_SIZE", "128")))
+# Number of embedding batches requested from the provider concurrently
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+# Embedding progress lines are emitted every this many batches (and for the last one)
+EMBED_PROGRESS_EVERY = int(os.getenv("EMBED_PROGRESS_EVERY", "4"))
+# Number of Qdrant upsert requests in flight at once during ingestion
+QDRANT_PARALLEL = int(os.getenv("QDRANT_PARALLEL", "4"))
+# Number of structured indexes back-filled concurrently for each processed file
+BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "8"))
+# Number of companies indexed concurrently by a /api/create-index job. These workers
+# hold no DB connection (the orchestrator saves all results at the end), so the pooled
+# connections (db_utils.DB_POOL_MAX, default 32) are shared by the
+# MAX_CONCURRENT_INDEX_JOBS orchestrators, up to FILE_CONCURRENCY * BACKFILL_CONCURRENCY
+# back-fill threads per upload job and any /api/get-all-data streams; borrowers beyond
+# DB_POOL_MAX wait for a free connection rather than fail.
+INDEXING_WORKERS = int(os.getenv("INDEXING_WORKERS", str(min(32, (os.cpu_count() or 1) * 4))))
+# Rows fetched per round trip when streaming /api/get-all-data
+ALL_DATA_FETCH_SIZE = int(os.getenv("ALL_DATA_FETCH_SIZE", "1000"))
+# Upper bound for ?limit= on paginated /api/get-all-data requests
+ALL_DATA_MAX_PAGE_SIZE = int(os.getenv("ALL_DATA_MAX_PAGE_SIZE", "1000"))
+# Vector quantization for newly created collections: scalar | binary | none
+QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "scalar").lower()
+
+# Use Qdrant's gRPC transport (protobuf, one persistent HTTP/2 channel) for data calls.
+# Opt-in because the gRPC port (QDRANT_GRPC_PORT, default 6334) must be reachable too.
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() in ("1", "true", "yes")
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
 
 # Initialize Qdrant client
 qdrant_client = QdrantClient(
     url=QDRANT_URL,
-    api_key=QDRANT_API_KEY
+    api_key=QDRANT_API_KEY,
+    prefer_grpc=QDRANT_PREFER_GRPC,
+    grpc_port=QDRANT_GRPC_PORT
 )
 
+# Keyword payload indexes so company/source/doc_id filters don't scan the collection
+PAYLOAD_INDEX_FIELDS = ["metadata.company", "metadata.source", "metadata.doc_id"]
+
+def ensure_payload_indexes():
+    """Create the keyword payload indexes on QDRANT_COLLECTION (no-op if they already exist)"""
+    for field_name in PAYLOAD_INDEX_FIELDS:
+        try:
+            qdrant_client.create_payload_index(
+                collection_name=QDRANT_COLLECTION,
+                field_name=field_name,
+                field_schema=PayloadSchemaType.KEYWORD
+            )
+        except Exception as e:
+            if "already exists" not in str(e):
+                print(f"WARNING: Could not create payload index on {field_name}: {e}")
+
+try:
+    if QDRANT_COLLECTION and qdrant_client.collection_exists(QDRANT_COLLECTION):
+        ensure_payload_indexes()
+except Exception as e:
+    print(f"WARNING: Skipping payload index setup, Qdrant unavailable: {e}")
+
 # Initialize Deka AI client
 from openai import OpenAI
 deka_client = OpenAI(api_key=DEKA_KEY, base_url=DEKA_BASE) if DEKA_BASE and DEKA_KEY else None
 
-def page_image_base64(pdf_doc, page_index: int, zoom: float = 3.0) -> str:
-    """Convert PDF page to base64 image - copied from reference.py"""
+def page_image_data_url(pdf_doc, page_index: int, zoom: float = OCR_ZOOM) -> str:
+    """
+    Convert PDF page to a base64 JPEG data URL.
+    The JPEG is encoded by OpenCV (libjpeg-turbo) when it is installed, otherwise by
+    PyMuPDF's native encoder; neither goes through PIL.
+    The prefix is added here so callers pass the result straight through without another concat.
+    """
     import fitz  # PyMuPDF
-    from PIL import Image
-    import io
-    import base64
+    import binascii
     
     page = pdf_doc[page_index]
     mat = fitz.Matrix(zoom, zoom)
-    pix = page.get_pixmap(matrix=mat, alpha=False)
-    img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
-    buf = io.BytesIO()
-    img.save(buf, format="JPEG", quality=80)
-    return base64.b64encode(buf.getvalue()).decode("utf-8")
+    # Explicit RGB so the JPEG encoders always get 3-channel samples
+    pix = page.get_pixmap(matrix=mat, colorspace=fitz.csRGB, alpha=False)
+    jpeg_bytes = _encode_jpeg(pix)
+    pix = None  # release the raw RGB samples before base64-encoding
+    if pybase64 is not None:
+        # SIMD (libbase64) encoder
+        return "data:image/jpeg;base64," + pybase64.b64encode_as_string(jpeg_bytes)
+    return "data:image/jpeg;base64," + binascii.b2a_base64(jpeg_bytes, newline=False).decode("ascii")
+
+def _encode_jpeg(pix):
+    """JPEG-encode an RGB pixmap, preferring OpenCV's SIMD encoder over PyMuPDF's."""
+    if cv2 is not None and pix.n == 3:
+        # numpy view over the samples (rows may be padded past width * 3 bytes);
+        # cvtColor then makes the one BGR copy OpenCV's encoder needs
+        rows = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.stride)
+        rgb = rows[:, :pix.width * 3].reshape(pix.height, pix.width, 3)
+        ok, buf = cv2.imencode(".jpg", cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR),
+                               [int(cv2.IMWRITE_JPEG_QUALITY), OCR_JPEG_QUALITY])
+        if ok:
+            return buf.tobytes()
+    return pix.tobytes("jpeg", jpg_quality=OCR_JPEG_QUALITY)
+
+_WHITESPACE_RE = re.compile(r"[ \t\r\f\v]+")
+_ZERO_WIDTH_RE = re.compile(r"[\u200b\u200c\u200d\ufeff]")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n\s*\n+")
 
 def _clean_text(s: str) -> str:
     """Text cleaning function - copied from reference.py"""
     if not s:
         return ""
     s = s.replace("\x00", " ")
-    import re
-    s = re.sub(r"[ \t\r\f\v]+", " ", s)
-    s = re.sub(r"\u200b|\u200c|\u200d|\ufeff", "", s)
-    s = re.sub(r"\n\s*\n\s*\n+", "\n\n", s)
+    s = _WHITESPACE_RE.sub(" ", s)
+    s = _ZERO_WIDTH_RE.sub("", s)
+    s = _BLANK_LINES_RE.sub("\n\n", s)
     return s.strip()
 
 def build_meta_header(meta: dict) -> str:
@@ -176,25 +468,78 @@ def build_meta_header(meta: dict) -> str:
 
 
 
-def ocr_pdf_pages(pdf_path: str, company_id: str, company: str, source_name: str, doc_id: str):
+OCR_SYSTEM_PROMPT = (
+    "You are an OCR engine specialized in Indonesian/English legal and technical contracts. "
+    "Your task is to extract text *exactly as it appears* in the document image, without rewriting or summarizing.\n\n"
+    "Guidelines:\n"
+    "- Preserve all line breaks, numbering, and indentation.\n"
+    "- Keep all headers, footers, and notes if they appear in the image.\n"
+    "- Preserve tables as text: keep rows and columns aligned with | separators. output it in Markdown table format Pad cells so that columns align visually.\n"
+    "- Do not translate text — output exactly as in the document.\n"
+    "- If a cell or field is blank, or contains only dots/dashes (e.g., '.....', '—'), write N/A.\n"
+    "- Keep units, percentages, currency (e.g., m², kVA, %, Rp.) exactly as written.\n"
+    "- If text is unclear, output it as ??? instead of guessing."
+)
+
+OCR_MAX_RETRIES = 3
+
+def _ocr_one_page(page_index: int, image_url: str) -> str:
+    """
+    OCR a single rendered page with retry/backoff. Runs in a worker thread.
+    Returns the cleaned page text, raises the last error after OCR_MAX_RETRIES attempts.
+    """
+    retries = 0
+    while True:
+        try:
+            resp = deka_client.chat.completions.create(
+                model=OCR_MODEL,
+                messages=[
+                    {"role": "system", "content": OCR_SYSTEM_PROMPT},
+                    {
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": f"Extract the text from this page {page_index+1} of the PDF."},
+                            {"type": "image_url", "image_url": {
+                                "url": image_url}}
+                        ]
+                    }
+                ],
+                max_tokens=8000,
+                temperature=0,
+                timeout=700
+            )
+            text = (resp.choices[0].message.content or "").strip()
+            return _clean_text(text)
+        except Exception as e:
+            retries += 1
+            if retries >= OCR_MAX_RETRIES:
+                raise
+            print(f"WARNING: OCR page {page_index+1} failed ({e}), retrying (attempt {retries+1}/{OCR_MAX_RETRIES})")
+            time.sleep(2 ** retries)
+
+def ocr_pdf_pages(pdf_path: str, company_id: str, company: str, source_name: str, doc_id: str, result: dict = None):
 
     # OCR PDF pages and yield progress updates - adapted from reference.py
+    # If result is given, the pages are stored in result["pages_data"] instead of
+    # being serialized into the final "completed" line.
     cache_path = get_ocr_cache_path(company_id, source_name)
     if os.path.exists(cache_path):
         print(f"DEBUG: Found side-by-side OCR cache for {source_name}. Loading from file.")
         try:
-            with open(cache_path, 'r') as f:
-                cached_pages_data = json.load(f)
+            cached_pages_data = load_json_file(cache_path)
             
-            yield json.dumps({"status": "started", "message": f"Loading {source_name} from cache..."}) + "\n"
-            yield json.dumps({
+            completed = {
                 "status": "completed",
                 "success_pages": len(cached_pages_data),
                 "failed_pages": 0,
                 "total_pages": len(cached_pages_data),
-                "pages_data": cached_pages_data,
                 "message": f"OCR completed for {source_name} from cache."
-            }) + "\n"
+            }
+            if result is not None:
+                result["pages_data"] = cached_pages_data
+            else:
+                completed["pages_data"] = cached_pages_data
+            yield _emit(completed)
             return
         except Exception as e:
             print(f"ERROR: Failed to load OCR cache for {source_name}: {e}. Re-processing.")
@@ -204,157 +549,140 @@ def ocr_pdf_pages(pdf_path: str, company_id: str, company: str, source_name: str
     print(f"DEBUG: Starting OCR for {source_name} (doc_id: {doc_id})")
     
     if not deka_client:
-        yield json.dumps({"error": "Deka AI client not configured"}) + "\n"
+        yield _emit({"error": "Deka AI client not configured"})
         return
     
     doc = fitz.open(pdf_path)
     total_pages = len(doc)
     success_pages = 0
     failed_pages = 0
-    MAX_RETRIES = 3
     
-    yield json.dumps({
-        "status": "started",
-        "message": f"Starting OCR for {source_name} ({total_pages} pages)",
-        "total_pages": total_pages,
-        "ocrProgress": {
-            "current_page": 0,
-            "total_pages": total_pages
-        }
-    }) + "\n"
-    
-    pages_out = []
+    # Pages are rendered here on the generator thread (a fitz.Document is not
+    # thread-safe) and only the network-bound OCR calls run in the pool. At most
+    # OCR_CONCURRENCY rendered pages are held in memory at once.
+    pages_out = [None] * total_pages
+    pending = {}
+    next_page = 0
+    # The document's current_file does not change during OCR; read it once
+    with processing_lock:
+        current_file_name = processing_states_memory.get(doc_id, {}).get("current_file", source_name)
     
-    for i in range(total_pages):
-        with processing_lock:
-            processing_states = load_processing_states(company_id)
-            if doc_id in processing_states:
-                processing_states[doc_id].update({
-                    "current_page": i + 1,
-                    "total_pages": total_pages,
-                    "message": f"Processing page {i+1}/{total_pages}"
-                })
-                if "steps" in processing_states[doc_id] and "ocr" in processing_states[doc_id]["steps"]:
-                    processing_states[doc_id]["steps"]["ocr"].update({
-                        "current_page": i + 1,
-                        "total_pages": total_pages,
-                        "message": f"Processing page {i+1}/{total_pages}"
-                    })
-                save_processing_states(company_id, processing_states)
-        
-        notify_processing_update({
-            "type": "page_started",
-            "doc_id": doc_id,
-            "page": i + 1,
-            "total_pages": total_pages
-        })
-        
-        yield json.dumps({
-            "status": "processing",
-            "current_page": i + 1,
-            "total_pages": total_pages,
-            "message": f"Processing page {i+1}/{total_pages}",
-            "ocrProgress": {
-                "current_page": i + 1,
-                "total_pages": total_pages
-            }
-        }) + "\n"
-        
-        retries = 0
-        page_success = False
-        last_error = None
-        
-        with processing_lock:
-            processing_states = load_processing_states(company_id)
-            current_file_name = processing_states.get(doc_id, {}).get("current_file") if 'doc_id' in locals() else source_name
-
-        yield json.dumps({
-            "status": "page_started",
-            "page": i + 1,
+    # Every yield after the open is inside the try, so the document is closed even
+    # if the consumer stops iterating early (GeneratorExit) or a page raises
+    try:
+        yield _emit({
+            "status": "started",
+            "message": f"Starting OCR for {source_name} ({total_pages} pages)",
             "total_pages": total_pages,
-            "currentFile": current_file_name,
-            "message": f"Starting OCR for page {i+1}/{total_pages}",
             "ocrProgress": {
-                "current_page": i + 1,
+                "current_page": 0,
                 "total_pages": total_pages
             }
-        }) + "\n"
+        })
         
-        while retries < MAX_RETRIES and not page_success:
-            try:
-                b64_image = page_image_base64(doc, i, zoom=3.0)
-                
-                yield json.dumps({
-                    "status": "page_api_call",
-                    "page": i + 1,
-                    "total_pages": total_pages,
-                    "currentFile": source_name,
-                    "message": f"Sending page {i+1}/{total_pages} to OCR service",
-                    "ocrProgress": {
+        with ThreadPoolExecutor(max_workers=OCR_CONCURRENCY, thread_name_prefix="OCRPage") as ocr_pool:
+            while next_page < total_pages or pending:
+                while next_page < total_pages and len(pending) < OCR_CONCURRENCY:
+                    i = next_page
+                    next_page += 1
+                    
+                    update_document_state(doc_id, {
                         "current_page": i + 1,
+                        "total_pages": total_pages,
+                        "message": f"Processing page {i+1}/{total_pages}"
+                    }, step="ocr")
+                    
+                    notify_processing_update({
+                        "type": "page_started",
+                        "doc_id": doc_id,
+                        "page": i + 1,
                         "total_pages": total_pages
-                    }
-                }) + "\n"
+                    })
+                    
+                    yield _emit({
+                        "status": "processing",
+                        "current_page": i + 1,
+                        "total_pages": total_pages,
+                        "message": f"Processing page {i+1}/{total_pages}",
+                        "ocrProgress": {
+                            "current_page": i + 1,
+                            "total_pages": total_pages
+                        }
+                    })
+                    
+                    yield _emit({
+                        "status": "page_started",
+                        "page": i + 1,
+                        "total_pages": total_pages,
+                        "currentFile": current_file_name,
+                        "message": f"Starting OCR for page {i+1}/{total_pages}",
+                        "ocrProgress": {
+                            "current_page": i + 1,
+                            "total_pages": total_pages
+                        }
+                    })
+                    
+                    try:
+                        image_url = page_image_data_url(doc, i)
+                    except Exception as e:
+                        failed_pages += 1
+                        error_msg = f"Failed to render page {i+1}: {e}"
+                        pages_out[i] = {"page": i + 1, "text": f"[OCR FAILED: {error_msg}]", "words": 0}
+                        _maybe_flush(company_id, force=True)
+                        yield _emit({
+                            "status": "page_failed",
+                            "page": i + 1,
+                            "error": error_msg
+                        })
+                        continue
+                    
+                    yield _emit({
+                        "status": "page_api_call",
+                        "page": i + 1,
+                        "total_pages": total_pages,
+                        "currentFile": source_name,
+                        "message": f"Sending page {i+1}/{total_pages} to OCR service",
+                        "ocrProgress": {
+                            "current_page": i + 1,
+                            "total_pages": total_pages
+                        }
+                    })
+                    
+                    pending[ocr_pool.submit(_ocr_one_page, i, image_url)] = i
                 
-                try:
-                    resp = deka_client.chat.completions.create(
-                        model=OCR_MODEL,
-                        messages=[
-                            {
-                                "role": "system",
-                                "content": (
-                                    "You are an OCR engine specialized in Indonesian/English legal and technical contracts. "
-                                    "Your task is to extract text *exactly as it appears* in the document image, without rewriting or summarizing.\n\n"
-                                    "Guidelines:\n"
-                                    "- Preserve all line breaks, numbering, and indentation.\n"
-                                    "- Keep all headers, footers, and notes if they appear in the image.\n"
-                                    "- Preserve tables as text: keep rows and columns aligned with | separators. output it in Markdown table format Pad cells so that columns align visually.\n"
-                                    "- Do not translate text — output exactly as in the document.\n"
-                                    "- If a cell or field is blank, or contains only dots/dashes (e.g., '.....', '—'), write N/A.\n"
-                                    "- Keep units, percentages, currency (e.g., m², kVA, %, Rp.) exactly as written.\n"
-                                    "- If text is unclear, output it as ??? instead of guessing."
-                                )
-                            },
-                            {
-                                "role": "user",
-                                "content": [
-                                    {"type": "text", "text": f"Extract the text from this page {i+1} of the PDF."},
-                                    {"type": "image_url", "image_url": {
-                                        "url": f"data:image/jpeg;base64,{b64_image}"}}
-                                ]
-                            }
-                        ],
-                        max_tokens=8000,
-                        temperature=0,
-                        timeout=700
-                    )
-                    text = (resp.choices[0].message.content or "").strip()
-                    text = _clean_text(text)
+                if not pending:
+                    continue
+                
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = pending.pop(future)
+                    try:
+                        text = future.result()
+                    except Exception as e:
+                        failed_pages += 1
+                        error_msg = f"Failed to process page {i+1} after {OCR_MAX_RETRIES} attempts: {e}"
+                        pages_out[i] = {"page": i + 1, "text": f"[OCR FAILED: {error_msg}]", "words": 0}
+                        _maybe_flush(company_id, force=True)
+                        yield _emit({
+                            "status": "page_failed",
+                            "page": i + 1,
+                            "error": error_msg
+                        })
+                        continue
                     
                     words = len(text.split())
-                    
-                    page_result = {
+                    pages_out[i] = {
                         "page": i + 1,
                         "text": text,
                         "words": words,
                     }
-                    pages_out.append(page_result)
                     success_pages += 1
-                    page_success = True
                     
-                    with processing_lock:
-                        processing_states = load_processing_states(company_id)
-                        if doc_id in processing_states:
-                            processing_states[doc_id].update({
-                                "completed_pages": success_pages,
-                                "message": f"Completed page {i+1}/{total_pages}"
-                            })
-                            if "steps" in processing_states[doc_id] and "ocr" in processing_states[doc_id]["steps"]:
-                                processing_states[doc_id]["steps"]["ocr"].update({
-                                    "completed_pages": success_pages,
-                                    "message": f"Completed page {i+1}/{total_pages}"
-                                })
-                            save_processing_states(company_id, processing_states)
+                    update_document_state(doc_id, {
+                        "completed_pages": success_pages,
+                        "message": f"Completed page {i+1}/{total_pages}"
+                    }, step="ocr")
+                    _maybe_flush(company_id)
                     
                     notify_processing_update({
                         "type": "page_completed",
@@ -364,7 +692,7 @@ def ocr_pdf_pages(pdf_path: str, company_id: str, company: str, source_name: str
                         "completed_pages": success_pages
                     })
                     
-                    yield json.dumps({
+                    yield _emit({
                         "status": "page_completed",
                         "page": i + 1,
                         "words": words,
@@ -373,68 +701,50 @@ def ocr_pdf_pages(pdf_path: str, company_id: str, company: str, source_name: str
                             "current_page": i + 1,
                             "total_pages": total_pages
                         }
-                    }) + "\n"
-                    
-                except Exception as e:
-                    retries += 1
-                    last_error = str(e)
-                    if retries < MAX_RETRIES:
-                        yield json.dumps({
-                            "status": "retry",
-                            "page": i + 1,
-                            "currentFile": source_name,
-                            "retry": retries,
-                            "message": f"Retrying page {i+1} (attempt {retries+1}/{MAX_RETRIES})"
-                        }) + "\n"
-                        time.sleep(2 ** retries)
-                    else:
-                        raise
-                        
-            except Exception as e:
-                retries += 1
-                last_error = str(e)
-                if retries < MAX_RETRIES:
-                    yield json.dumps({
-                        "status": "retry",
-                        "page": i + 1,
-                        "currentFile": source_name,
-                        "retry": retries,
-                        "message": f"Retrying page {i+1} (attempt {retries+1}/{MAX_RETRIES})"
-                    }) + "\n"
-                    time.sleep(2 ** retries)
-                else:
-                    failed_pages += 1
-                    error_msg = f"Failed to process page {i+1} after {MAX_RETRIES} attempts: {last_error}"
-                    yield json.dumps({
-                        "status": "page_failed",
-                        "page": i + 1,
-                        "error": error_msg
-                    }) + "\n"
-                    
-                    pages_out.append({
-                        "page": i + 1,
-                        "text": f"[OCR FAILED: {error_msg}]",
-                        "words": 0,
                     })
-                    page_success = True
+    finally:
+        doc.close()
+        _maybe_flush(company_id, force=True)
     
-    doc.close()
+    pages_out = [page for page in pages_out if page is not None]
 
+    # Write to a temp file and rename it into place, so the indexer (or a crash)
+    # never sees a half-written cache file
+    tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
     try:
-        with open(cache_path, 'w') as f:
-            json.dump(pages_out, f, indent=2)
+        # Compact JSON: the cache is only machine-read, and indentation roughly
+        # doubles both the file size and the encode/parse time
+        if orjson is not None:
+            with open(tmp_path, 'wb') as f:
+                f.write(orjson.dumps(pages_out))
+        else:
+            with open(tmp_path, 'w') as f:
+                json.dump(pages_out, f, separators=(",", ":"))
+        os.replace(tmp_path, cache_path)
         print(f"DEBUG: Saved OCR results for {source_name} to cache.")
     except Exception as e:
         print(f"ERROR: Failed to save OCR cache for {source_name}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
 
-    yield json.dumps({
+    completed = {
         "status": "completed",
         "success_pages": success_pages,
         "failed_pages": failed_pages,
         "total_pages": total_pages,
-        "pages_data": pages_out,
         "message": f"OCR completed for {source_name}: {success_pages}/{total_pages} pages successful"
-    }) + "\n"
+    }
+    if result is not None:
+        result["pages_data"] = pages_out
+    else:
+        completed["pages_data"] = pages_out
+    yield _emit(completed)
+
+# Embedding dimension per model, learned from the first real batch instead of a probe call.
+# EMBED_DIM seeds it for EMBED_MODEL so even the first document reports it up front.
+_EMBED_DIM_CACHE = {EMBED_MODEL: int(os.getenv("EMBED_DIM"))} if os.getenv("EMBED_DIM") else {}
 
 def build_embedder():
     """Build OpenAI embeddings compatible with Deka AI - adapted from reference.py"""
@@ -446,112 +756,205 @@ def build_embedder():
     return OpenAIEmbeddings(
         api_key=DEKA_KEY,
         base_url=DEKA_BASE,
-        model=os.getenv("EMBED_MODEL", "baai/bge-multilingual-gemma2"),
+        model=EMBED_MODEL,
         model_kwargs={"encoding_format": "float"}
     )
 
-def generate_embeddings(chunks_data, doc_id):
-    """Generate embeddings for document chunks with progress tracking"""
+# Completed embedding batches waiting for Qdrant; bounds memory when ingestion lags
+INGEST_QUEUE_SIZE = 4
+
+# SHA-1 state after hashing NAMESPACE_URL; copied per ID instead of re-hashing the namespace
+_UUID5_URL_NAMESPACE_SHA1 = hashlib.sha1(uuid.NAMESPACE_URL.bytes)
+
+def uuid5_url(name):
+    """Same value as str(uuid.uuid5(uuid.NAMESPACE_URL, name)), so existing point IDs are unchanged"""
+    digest = _UUID5_URL_NAMESPACE_SHA1.copy()
+    digest.update(name.encode("utf-8"))
+    return str(uuid.UUID(bytes=digest.digest()[:16], version=5))
+
+def _build_points(chunks, vectors, doc_id):
+    """Build Qdrant point dicts (UUIDv5 id, vector, payload) for embedded chunks"""
+    points = []
+    # Chunks from the same page share an ID; hash each page once
+    page_ids = {}
+    for i, chunk in enumerate(chunks):
+        # Generate point ID using UUIDv5 (similar to reference.py)
+        page = chunk['page']
+        point_id = page_ids.get(page)
+        if point_id is None:
+            point_id = page_ids[page] = uuid5_url(f"{doc_id}:{page}")
+        
+        points.append({
+            "id": point_id,
+            "vector": vectors[i] if i < len(vectors) else None,
+            "payload": {
+                "content": chunk["text"],
+                "metadata": chunk.get("meta", {})
+            }
+        })
+    return points
+
+def iter_point_batches(points_queue):
+    """Yield the point lists put on points_queue by generate_embeddings until its None sentinel"""
+    while True:
+        item = points_queue.get()
+        if item is None:
+            return
+        yield item
+
+def _rebatch(point_batches, size):
+    """Regroup an iterable of point lists into lists of exactly size points (last may be shorter)"""
+    buffer = []
+    for batch in point_batches:
+        buffer.extend(batch)
+        while len(buffer) >= size:
+            yield buffer[:size]
+            buffer = buffer[size:]
+    if buffer:
+        yield buffer
+
+def generate_embeddings(chunks_data, doc_id, points_queue=None, result=None):
+    """
+    Generate embeddings for document chunks with progress tracking.
+    If points_queue is given, each completed batch's list of points is put on
+    it so ingestion can start before all embeddings are done;
+    a None sentinel is always put when the generator finishes. Otherwise the
+    full points are returned in the "embedding_completed" line's points_data.
+    If result (a dict) is given, result["vectors_generated"] is set on success.
+    """
     try:
         # Build embedder
         embedder = build_embedder()
         if not embedder:
-            yield json.dumps({"error": "Embedder not configured"}) + "\n"
+            yield _emit({"error": "Embedder not configured"})
             return
             
-        # Detect embedding dimension
-        dim = len(embedder.embed_query("hello world"))
-        yield json.dumps({
+        # Dimension is known once a batch for this model has been embedded
+        dim = _EMBED_DIM_CACHE.get(EMBED_MODEL)
+        yield _emit({
             "status": "embedding_started",
             "message": f"Generating embeddings for {len(chunks_data)} chunks",
             "dimension": dim,
             "chunk_count": len(chunks_data)
-        }) + "\n"
+        })
         
         # Prepare chunks for embedding
         texts = [chunk["text"] for chunk in chunks_data]
         total_chunks = len(texts)
         
-        # Generate embeddings in batches
-        BATCH_SIZE = int(os.getenv("BATCH_SIZE", "64"))
-        vectors = []
+        # Generate embeddings in batches, EMBED_CONCURRENCY batches in flight at once
+        total_batches = (total_chunks + EMBED_BATCH_SIZE - 1) // EMBED_BATCH_SIZE
+        # Vectors are only kept here when there is no points_queue to hand them to;
+        # each batch is written into its slot by index as it completes
+        vectors = [None] * total_chunks if points_queue is None else None
+        completed_batches = 0
+        vectors_generated = 0
         
-        for i in range(0, total_chunks, BATCH_SIZE):
-            batch = texts[i:i + BATCH_SIZE]
-            batch_num = (i // BATCH_SIZE) + 1
-            total_batches = (total_chunks + BATCH_SIZE - 1) // BATCH_SIZE
-            
-            yield json.dumps({
-                "status": "embedding_batch",
-                "batch": batch_num,
-                "total_batches": total_batches,
-                "message": f"Generating embeddings for batch {batch_num}/{total_batches}",
-                "embeddingProgress": {
+        with ThreadPoolExecutor(max_workers=EMBED_CONCURRENCY, thread_name_prefix="Embedder") as embed_pool:
+            futures = {}
+            for i in range(0, total_chunks, EMBED_BATCH_SIZE):
+                batch = texts[i:i + EMBED_BATCH_SIZE]
+                batch_num = (i // EMBED_BATCH_SIZE) + 1
+                futures[embed_pool.submit(embedder.embed_documents, batch)] = batch_num
+                
+                if batch_num % EMBED_PROGRESS_EVERY and batch_num != total_batches:
+                    continue
+                yield _emit({
+                    "status": "embedding_batch",
                     "batch": batch_num,
-                    "total_batches": total_batches
-                }
-            }) + "\n"
+                    "total_batches": total_batches,
+                    "message": f"Generating embeddings for batch {batch_num}/{total_batches}",
+                    "embeddingProgress": {
+                        "batch": batch_num,
+                        "total_batches": total_batches
+                    }
+                })
             
-            try:
-                # Generate embeddings for batch
-                batch_vectors = embedder.embed_documents(batch)
-                vectors.extend(batch_vectors)
+            for future in as_completed(futures):
+                batch_num = futures[future]
+                try:
+                    batch_vectors = future.result()
+                except Exception as e:
+                    for pending in futures:
+                        pending.cancel()
+                    yield _emit({
+                        "status": "embedding_error",
+                        "batch": batch_num,
+                        "error": f"Failed to generate embeddings for batch {batch_num}: {str(e)}"
+                    })
+                    return
+                
+                completed_batches += 1
+                vectors_generated += len(batch_vectors)
+                if batch_vectors and EMBED_MODEL not in _EMBED_DIM_CACHE:
+                    _EMBED_DIM_CACHE[EMBED_MODEL] = len(batch_vectors[0])
                 
-                yield json.dumps({
+                start = (batch_num - 1) * EMBED_BATCH_SIZE
+                if points_queue is not None:
+                    batch_chunks = chunks_data[start:start + EMBED_BATCH_SIZE]
+                    points_queue.put(_build_points(batch_chunks, batch_vectors, doc_id))
+                else:
+                    vectors[start:start + len(batch_vectors)] = batch_vectors
+                
+                if completed_batches % EMBED_PROGRESS_EVERY and completed_batches != total_batches:
+                    continue
+                yield _emit({
                     "status": "embedding_batch_completed",
                     "batch": batch_num,
                     "processed": len(batch_vectors),
                     "message": f"Completed batch {batch_num}/{total_batches}",
                     "embeddingProgress": {
-                        "batch": batch_num,
+                        "batch": completed_batches,
                         "total_batches": total_batches
                     }
-                }) + "\n"
-                
-            except Exception as e:
-                yield json.dumps({
-                    "status": "embedding_error",
-                    "batch": batch_num,
-                    "error": f"Failed to generate embeddings for batch {batch_num}: {str(e)}"
-                }) + "\n"
-                return
-        
-        # Prepare final result with IDs and payloads
-        result_data = []
-        for i, chunk in enumerate(chunks_data):
-            # Generate point ID using UUIDv5 (similar to reference.py)
-            import uuid
-            point_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{doc_id}:{chunk['page']}"))
-            
-            result_data.append({
-                "id": point_id,
-                "vector": vectors[i] if i < len(vectors) else None,
-                "payload": {
-                    "content": chunk["text"],
-                    "metadata": chunk.get("meta", {})
-                }
-            })
+                })
         
-        yield json.dumps({
+        completed = {
             "status": "embedding_completed",
-            "vectors_generated": len(vectors),
-            "points_data": result_data,
-            "message": f"Embedding completed: {len(vectors)} vectors generated"
-        }) + "\n"
+            "vectors_generated": vectors_generated,
+            "message": f"Embedding completed: {vectors_generated} vectors generated"
+        }
+        if points_queue is None:
+            # Prepare final result with IDs and payloads
+            completed["points_data"] = _build_points(chunks_data, vectors, doc_id)
+        if result is not None:
+            result["vectors_generated"] = vectors_generated
+        
+        yield _emit(completed)
         
     except Exception as e:
-        yield json.dumps({
+        yield _emit({
             "status": "embedding_failed",
             "error": f"Embedding generation failed: {str(e)}"
-        }) + "\n"
-
-def ingest_to_qdrant(points_data, company_name, source_name):
-    """Ingest embedded points to Qdrant with progress tracking"""
+        })
+    finally:
+        if points_queue is not None:
+            points_queue.put(None)
+
+def build_quantization_config(rest):
+    """Return the quantization config for QDRANT_QUANTIZATION, or None when disabled"""
+    if QDRANT_QUANTIZATION == "scalar":
+        return rest.ScalarQuantization(
+            scalar=rest.ScalarQuantizationConfig(
+                type=rest.ScalarType.INT8, quantile=0.99, always_ram=True))
+    if QDRANT_QUANTIZATION == "binary":
+        return rest.BinaryQuantization(
+            binary=rest.BinaryQuantizationConfig(always_ram=True))
+    return None
+
+def ingest_to_qdrant(point_batches, company_name, source_name, total_points, result=None):
+    """
+    Ingest embedded points to Qdrant with progress tracking.
+    point_batches is an iterable of point lists (e.g. iter_point_batches()),
+    consumed as it is produced so ingestion can overlap embedding.
+    If result (a dict) is given, result["point_ids"] lists the IDs of every
+    point sent to Qdrant, whether or not its upsert was acknowledged.
+    """
+    upsert_pool = ThreadPoolExecutor(max_workers=QDRANT_PARALLEL, thread_name_prefix="QdrantUpsert")
     try:
         from qdrant_client.http import models as rest
         
-        total_points = len(points_data)
-        yield json.dumps({
+        yield _emit({
             "status": "ingestion_started",
             "message": f"Starting ingestion of {total_points} points to Qdrant",
             "total_points": total_points,
@@ -559,47 +962,83 @@ def ingest_to_qdrant(points_data, company_name, source_name):
                 "points_ingested": 0,
                 "total_points": total_points
             }
-        }) + "\n"
-        
-        # Ensure collection exists
-        try:
-            # Check if collection exists by trying to get its info
-            qdrant_client.get_collection(QDRANT_COLLECTION)
-        except Exception as e:
-            # Collection doesn't exist, create it
-            try:
-                # Get dimension from first vector if available
-                dim = len(points_data[0]["vector"]) if points_data and points_data[0]["vector"] else 768
-                
-                qdrant_client.create_collection(
-                    collection_name=QDRANT_COLLECTION,
-                    vectors_config=rest.VectorParams(
-                        size=dim, distance=rest.Distance.COSINE),
-                )
-                yield json.dumps({
-                    "status": "collection_created",
-                    "message": f"Created collection {QDRANT_COLLECTION} with dimension {dim}"
-                }) + "\n"
-            except Exception as create_error:
-                # Handle case where collection was created by another process
-                if "already exists" in str(create_error):
-                    yield json.dumps({
-                        "status": "collection_exists",
-                        "message": f"Collection {QDRANT_COLLECTION} already exists"
-                    }) + "\n"
-                else:
-                    raise create_error
+        })
         
-        # Batch upload points
-        BATCH_SIZE = int(os.getenv("BATCH_SIZE", "64"))
+        total_batches = (total_points + QDRANT_BATCH_SIZE - 1) // QDRANT_BATCH_SIZE
         uploaded_count = 0
+        collection_checked = False
+        pending = {}
         
-        for i in range(0, total_points, BATCH_SIZE):
-            batch = points_data[i:i + BATCH_SIZE]
-            batch_num = (i // BATCH_SIZE) + 1
-            total_batches = (total_points + BATCH_SIZE - 1) // BATCH_SIZE
+        def report_done(done):
+            """Yield progress for finished upserts; returns False if one of them failed."""
+            nonlocal uploaded_count
+            for fut in done:
+                done_batch_num, done_count = pending.pop(fut)
+                try:
+                    fut.result()
+                except Exception as e:
+                    for other in pending:
+                        other.cancel()
+                    yield _emit({
+                        "status": "ingestion_error",
+                        "batch": done_batch_num,
+                        "error": f"Failed to ingest batch {done_batch_num}: {str(e)}"
+                    })
+                    return False
+                
+                uploaded_count += done_count
+                
+                yield _emit({
+                    "status": "ingestion_batch_completed",
+                    "batch": done_batch_num,
+                    "uploaded": done_count,
+                    "total_uploaded": uploaded_count,
+                    "message": f"Completed ingestion batch {done_batch_num}/{total_batches}",
+                    "ingestionProgress": {
+                        "points_ingested": uploaded_count,
+                        "total_points": total_points
+                    }
+                })
+            return True
+        
+        for batch_num, batch in enumerate(_rebatch(point_batches, QDRANT_BATCH_SIZE), start=1):
+            if not collection_checked:
+                collection_checked = True
+                # Ensure collection exists
+                try:
+                    # Check if collection exists by trying to get its info
+                    qdrant_client.get_collection(QDRANT_COLLECTION)
+                except Exception as e:
+                    # Collection doesn't exist, create it
+                    try:
+                        # Get dimension from first vector if available
+                        dim = len(batch[0]["vector"]) if batch and batch[0]["vector"] else 768
+                        
+                        quantization_config = build_quantization_config(rest)
+                        qdrant_client.create_collection(
+                            collection_name=QDRANT_COLLECTION,
+                            vectors_config=rest.VectorParams(
+                                size=dim, distance=rest.Distance.COSINE,
+                                # Originals can live on disk when a quantized copy is kept in RAM
+                                on_disk=quantization_config is not None),
+                            quantization_config=quantization_config,
+                        )
+                        ensure_payload_indexes()
+                        yield _emit({
+                            "status": "collection_created",
+                            "message": f"Created collection {QDRANT_COLLECTION} with dimension {dim}"
+                        })
+                    except Exception as create_error:
+                        # Handle case where collection was created by another process
+                        if "already exists" in str(create_error):
+                            yield _emit({
+                                "status": "collection_exists",
+                                "message": f"Collection {QDRANT_COLLECTION} already exists"
+                            })
+                        else:
+                            raise create_error
             
-            yield json.dumps({
+            yield _emit({
                 "status": "ingestion_batch",
                 "batch": batch_num,
                 "total_batches": total_batches,
@@ -608,49 +1047,48 @@ def ingest_to_qdrant(points_data, company_name, source_name):
                     "batch": batch_num,
                     "total_batches": total_batches
                 }
-            }) + "\n"
+            })
             
-            try:
-                # Create PointStruct objects for batch
-                points = [
-                    rest.PointStruct(
-                        id=point["id"],
-                        vector=point["vector"],
-                        payload=point["payload"]
-                    )
-                    for point in batch
-                ]
-                
-                # Upload batch to Qdrant
-                qdrant_client.upsert(
-                    collection_name=QDRANT_COLLECTION,
-                    points=points,
-                    wait=True
-                )
-                
-                uploaded_count += len(points)
-                
-                yield json.dumps({
-                    "status": "ingestion_batch_completed",
-                    "batch": batch_num,
-                    "uploaded": len(points),
-                    "total_uploaded": uploaded_count,
-                    "message": f"Completed ingestion batch {batch_num}/{total_batches}",
-                    "ingestionProgress": {
-                        "points_ingested": uploaded_count,
-                        "total_points": total_points
-                    }
-                }) + "\n"
-                
-            except Exception as e:
-                yield json.dumps({
-                    "status": "ingestion_error",
-                    "batch": batch_num,
-                    "error": f"Failed to ingest batch {batch_num}: {str(e)}"
-                }) + "\n"
+            # Column-wise batch: one model for the whole batch instead of a PointStruct per point
+            point_ids = [point["id"] for point in batch]
+            points = rest.Batch(
+                ids=point_ids,
+                vectors=[point["vector"] for point in batch],
+                payloads=[point["payload"] for point in batch]
+            )
+            
+            # The last batch is the durability barrier: it is sent only after every
+            # earlier upsert was acknowledged, with wait=True, so once it returns the
+            # server has applied the whole document and it is searchable
+            is_last = batch_num >= total_batches
+            if is_last and pending:
+                if not (yield from report_done(as_completed(list(pending)))):
+                    return
+            
+            if result is not None:
+                result.setdefault("point_ids", []).extend(point_ids)
+            
+            # Upload batch to Qdrant without blocking on server-side indexing;
+            # up to QDRANT_PARALLEL batches are in flight at once
+            future = upsert_pool.submit(
+                qdrant_client.upsert,
+                collection_name=QDRANT_COLLECTION,
+                points=points,
+                wait=is_last
+            )
+            pending[future] = (batch_num, len(batch))
+            
+            if len(pending) >= QDRANT_PARALLEL:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            else:
+                done = [fut for fut in pending if fut.done()]
+            if not (yield from report_done(done)):
                 return
         
-        yield json.dumps({
+        if not (yield from report_done(as_completed(list(pending)))):
+            return
+        
+        yield _emit({
             "status": "ingestion_completed",
             "total_points": uploaded_count,
             "company": company_name,
@@ -660,102 +1098,205 @@ def ingest_to_qdrant(points_data, company_name, source_name):
                 "points_ingested": uploaded_count,
                 "total_points": uploaded_count
             }
-        }) + "\n"
+        })
     except Exception as e:
-        yield json.dumps({
+        yield _emit({
             "status": "ingestion_failed",
             "error": f"Ingestion to Qdrant failed: {str(e)}"
-        }) + "\n"
+        })
+    finally:
+        # Wait for upserts already in flight so that a rollback delete by the caller
+        # runs after them and cannot leave late-landing points behind
+        upsert_pool.shutdown(wait=True, cancel_futures=True)
+        # Points were (possibly partially) written either way
+        invalidate_company_documents_cache()
+
+def start_ingestion_worker(points_queue, company_name, source_name, total_points, result=None):
+    """
+    Run ingest_to_qdrant on a background thread fed by points_queue.
+    Returns (thread, events) where events is a queue of progress lines
+    terminated by a None sentinel. result is passed on to ingest_to_qdrant.
+    """
+    events = queue.Queue()
+    
+    def run():
+        point_batches = iter_point_batches(points_queue)
+        try:
+            for update in ingest_to_qdrant(point_batches, company_name, source_name, total_points, result=result):
+                events.put(update)
+        finally:
+            # Keep draining so the embedding producer never blocks on a full queue
+            for _ in point_batches:
+                pass
+            events.put(None)
+    
+    thread = threading.Thread(target=run, name=f"Ingest-{source_name}", daemon=True)
+    thread.start()
+    return thread, events
+
+def document_is_indexed(doc_id):
+    """
+    True if QDRANT_COLLECTION already holds points for doc_id. Errors (including a
+    missing collection) also return True, which only costs the embedding/ingestion overlap.
+    """
+    try:
+        points, _ = qdrant_client.scroll(
+            collection_name=QDRANT_COLLECTION,
+            scroll_filter=Filter(must=[FieldCondition(key="metadata.doc_id", match=MatchValue(value=doc_id))]),
+            limit=1,
+            with_payload=False,
+            with_vectors=False
+        )
+    except Exception:
+        return True
+    return bool(points)
         
+# Only the metadata fields needed to build the company/document tree
+COMPANY_DOCUMENT_FIELDS = PayloadSelectorInclude(include=[
+    "metadata.company",
+    "metadata.source",
+    "metadata.doc_id",
+    "metadata.upload_time",
+    "metadata.page",
+])
+# Points per scroll request. Scrolls only fetch a few metadata fields, so large
+# pages stay small on the wire while cutting round trips on big collections.
+SCROLL_PAGE_SIZE = int(os.getenv("SCROLL_PAGE_SIZE", "4096"))
+
+def scroll_pages(**scroll_kwargs):
+    """
+    Yield the point lists of a full QDRANT_COLLECTION scroll. The next page is
+    requested on a helper thread while the caller processes the current one, so
+    the network round trip overlaps the Python-side aggregation.
+    """
+    def fetch(offset):
+        return qdrant_client.scroll(
+            collection_name=QDRANT_COLLECTION,
+            limit=SCROLL_PAGE_SIZE,
+            offset=offset,
+            with_vectors=False,
+            **scroll_kwargs
+        )
+    
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="ScrollPrefetch") as prefetch:
+        future = prefetch.submit(fetch, None)
+        while future is not None:
+            points, next_offset = future.result()
+            future = prefetch.submit(fetch, next_offset) if next_offset is not None else None
+            yield points
+
+def fetch_company_documents():
+    """
+    Scroll the collection and build {company: {source: {doc_id, upload_time, pages}}}.
+    Only the metadata fields in COMPANY_DOCUMENT_FIELDS are transferred.
+    """
+    company_documents = {}
+    for points in scroll_pages(with_payload=COMPANY_DOCUMENT_FIELDS):
+        for point in points:
+            metadata = point.payload.get('metadata', {}) if point.payload else {}
+            company = metadata.get('company')
+            source = metadata.get('source')
+            page = metadata.get('page')
+            
+            if company and source:
+                docs = company_documents.get(company)
+                if docs is None:
+                    docs = company_documents[company] = {}
+                doc_info = docs.get(source)
+                if doc_info is None:
+                    doc_info = docs[source] = {
+                        'doc_id': metadata.get('doc_id'),
+                        'upload_time': metadata.get('upload_time'),
+                        'pages': []
+                    }
+                if page is not None:
+                    doc_info['pages'].append(page)
+    
+    for docs in company_documents.values():
+        for doc_info in docs.values():
+            doc_info['pages'] = sorted(set(doc_info['pages']))
+    return company_documents
+
+# fetch_company_documents() result, reused until it expires or a write to the
+# collection (ingest/delete) invalidates it
+COMPANY_DOCUMENTS_CACHE_TTL = float(os.getenv("COMPANY_DOCUMENTS_CACHE_TTL", "300"))
+_company_documents_cache = None  # (fetched_at, company_documents)
+_company_documents_generation = 0
+_company_documents_lock = threading.Lock()
+
+def get_company_documents_cached():
+    """fetch_company_documents(), served from the cache while it is fresh."""
+    global _company_documents_cache
+    with _company_documents_lock:
+        cached = _company_documents_cache
+        generation = _company_documents_generation
+    if cached is not None and time.time() - cached[0] < COMPANY_DOCUMENTS_CACHE_TTL:
+        return cached[1]
+    
+    company_documents = fetch_company_documents()
+    with _company_documents_lock:
+        # Don't store a result that an invalidation raced with
+        if generation == _company_documents_generation:
+            _company_documents_cache = (time.time(), company_documents)
+    return company_documents
+
+def invalidate_company_documents_cache():
+    """Drop the cached company/document tree after points were added or deleted."""
+    global _company_documents_cache, _company_documents_generation
+    with _company_documents_lock:
+        _company_documents_cache = None
+        _company_documents_generation += 1
+
 def notify_qdrant_data_update():
     """Queries Qdrant for the full company/document structure and notifies listeners."""
     try:
-        company_documents = {}
-        offset = None
-        while True:
-            response = qdrant_client.scroll(
-                collection_name=QDRANT_COLLECTION,
-                limit=100,
-                offset=offset,
-                with_payload=True,
-                with_vectors=False
-            )
-            points, next_offset = response
-            for point in points:
-                metadata = point.payload.get('metadata', {}) if point.payload else {}
-                company = metadata.get('company')
-                source = metadata.get('source')
-                doc_id_meta = metadata.get('doc_id')
-                upload_time = metadata.get('upload_time')
-                page = metadata.get('page')
-                
-                if company and source:
-                    if company not in company_documents:
-                        company_documents[company] = {}
-                    if source not in company_documents[company]:
-                        company_documents[company][source] = {
-                            'doc_id': doc_id_meta,
-                            'upload_time': upload_time,
-                            'pages': []
-                        }
-                    if page is not None:
-                        company_documents[company][source]['pages'].append(page)
-            if next_offset is None:
-                break
-            offset = next_offset
-        
-        result = {}
-        for comp, docs in company_documents.items():
-            result[comp] = {}
-            for doc_name, doc_info in docs.items():
-                doc_info['pages'].sort()
-                result[comp][doc_name] = doc_info
-        
         notify_processing_update({
             "type": "qdrant_data_updated",
-            "data": result
+            "data": fetch_company_documents()
         })
         print("DEBUG: Notified clients of Qdrant data update after job completion")
     except Exception as qdrant_notify_error:
         print(f"ERROR notifying Qdrant data update: {qdrant_notify_error}")
 
+# Distinct-value lookups use one facet request when the Qdrant server supports it
+# (>= 1.12, keyword-indexed field); a full page of hits means it may be truncated
+FACET_LIMIT = 10000
+
+def distinct_metadata_values(field, scroll_filter=None):
+    """
+    Return the set of distinct values of payload field metadata.<field>, optionally
+    restricted by scroll_filter. Falls back to scrolling just that field when
+    facets are unavailable or may be truncated.
+    """
+    key = f"metadata.{field}"
+    try:
+        hits = qdrant_client.facet(
+            collection_name=QDRANT_COLLECTION,
+            key=key,
+            facet_filter=scroll_filter,
+            limit=FACET_LIMIT
+        ).hits
+        if len(hits) < FACET_LIMIT:
+            return {hit.value for hit in hits}
+    except Exception as e:
+        print(f"DEBUG: Facet on {key} unavailable, scrolling instead: {e}")
+    
+    values = set()
+    for points in scroll_pages(with_payload=[key], scroll_filter=scroll_filter):
+        for point in points:
+            metadata = point.payload.get('metadata', {}) if point.payload else {}
+            value = metadata.get(field)
+            if value:
+                values.add(value)
+    return values
+
 @app.route('/api/companies', methods=['GET'])
 def get_companies():
     """
     Get all unique company names from Qdrant metadata
     """
     try:
-        # Scroll through all points to get unique companies
-        companies = set()
-        offset = None
-        
-        while True:
-            # Fetch points with pagination
-            response = qdrant_client.scroll(
-                collection_name=QDRANT_COLLECTION,
-                limit=100,
-                offset=offset,
-                with_payload=True,
-                with_vectors=False
-            )
-            
-            points, next_offset = response
-            
-            # Extract company names from metadata (matching document_api.py structure)
-            for point in points:
-                metadata = point.payload.get('metadata', {}) if point.payload else {}
-                company = metadata.get('company')
-                if company:
-                    companies.add(company)
-            
-            # Break if no more points
-            if next_offset is None:
-                break
-                
-            offset = next_offset
-        
-        # Convert to sorted list
-        company_list = sorted(list(companies))
+        company_list = sorted(distinct_metadata_values('company'))
         
         return jsonify({
             'success': True,
@@ -784,38 +1325,7 @@ def get_company_documents(company_name):
             ]
         )
         
-        # Scroll through points filtered by company
-        documents = set()
-        offset = None
-        
-        while True:
-            # Fetch points with pagination
-            response = qdrant_client.scroll(
-                collection_name=QDRANT_COLLECTION,
-                limit=100,
-                offset=offset,
-                with_payload=True,
-                with_vectors=False,
-                scroll_filter=company_filter
-            )
-            
-            points, next_offset = response
-            
-            # Extract document sources from metadata (matching document_api.py structure)
-            for point in points:
-                metadata = point.payload.get('metadata', {}) if point.payload else {}
-                source = metadata.get('source')
-                if source:
-                    documents.add(source)
-            
-            # Break if no more points
-            if next_offset is None:
-                break
-                
-            offset = next_offset
-        
-        # Convert to sorted list
-        document_list = sorted(list(documents))
+        document_list = sorted(distinct_metadata_values('source', company_filter))
         
         return jsonify({
             'success': True,
@@ -825,17 +1335,10 @@ def get_company_documents(company_name):
         
     except Exception as e:
         error_msg = str(e)
-        # Handle specific indexing error
-        if "Index required but not found" in error_msg:
-            return jsonify({
-                'success': False,
-                'error': f'Indexing error: Please create an index on "metadata.company" field in Qdrant. {error_msg}'
-            }), 400
-        else:
-            return jsonify({
-                'success': False,
-                'error': f'Failed to fetch documents for company {company_name}: {error_msg}'
-            }), 500
+        return jsonify({
+            'success': False,
+            'error': f'Failed to fetch documents for company {company_name}: {error_msg}'
+        }), 500
 
 @app.route('/api/companies-with-documents', methods=['GET'])
 def get_companies_with_documents():
@@ -844,81 +1347,21 @@ def get_companies_with_documents():
     Returns a dictionary mapping company names to lists of document details
     """
     try:
-        # Scroll through all points to get companies and documents
-        company_documents = {}
-        offset = None
+        # Single scroll that only transfers the metadata fields the response needs,
+        # cached until the collection changes
+        result = get_company_documents_cached()
         
-        while True:
-            # Fetch points with pagination
-            response = qdrant_client.scroll(
-                collection_name=QDRANT_COLLECTION,
-                limit=100,
-                offset=offset,
-                with_payload=True,
-                with_vectors=False
-            )
-            
-            points, next_offset = response
-            
-            # Extract company names and documents from metadata
-            for point in points:
-                metadata = point.payload.get('metadata', {}) if point.payload else {}
-                company = metadata.get('company')
-                source = metadata.get('source')
-                doc_id = metadata.get('doc_id')
-                upload_time = metadata.get('upload_time')
-                page = metadata.get('page')
-                
-                if company and source:
-                    # Add company to dict if not exists
-                    if company not in company_documents:
-                        company_documents[company] = {}
-                    
-                    # Add document to company's document dict if not exists
-                    if source not in company_documents[company]:
-                        company_documents[company][source] = {
-                            'doc_id': doc_id,
-                            'upload_time': upload_time,
-                            'pages': []
-                        }
-                    
-                    # Add page info
-                    if page is not None:
-                        company_documents[company][source]['pages'].append(page)
-            
-            # Break if no more points
-            if next_offset is None:
-                break
-                
-            offset = next_offset
-        
-        # Convert to the required format with sorted pages
-        result = {}
-        for company, documents in company_documents.items():
-            result[company] = {}
-            for doc_name, doc_info in documents.items():
-                # Sort pages numerically
-                doc_info['pages'].sort()
-                result[company][doc_name] = doc_info
-        
-        return jsonify({
+        return json_response({
             'success': True,
             'data': result
         })
         
     except Exception as e:
         error_msg = str(e)
-        # Handle specific indexing error
-        if "Index required but not found" in error_msg:
-            return jsonify({
-                'success': False,
-                'error': f'Indexing error: Please create an index on "metadata.company" field in Qdrant. {error_msg}'
-            }), 400
-        else:
-            return jsonify({
-                'success': False,
-                'error': f'Failed to fetch companies with documents: {error_msg}'
-            }), 500
+        return jsonify({
+            'success': False,
+            'error': f'Failed to fetch companies with documents: {error_msg}'
+        }), 500
 
 @app.route('/api/companies/<company_name>', methods=['DELETE'])
 def delete_company_data(company_name):
@@ -932,17 +1375,19 @@ def delete_company_data(company_name):
             collection_name=QDRANT_COLLECTION,
             points_selector=company_filter
         )
+        invalidate_company_documents_cache()
         print(f"DEBUG: Deleted Qdrant data for company {company_name}")
 
-        # Now, delete the entire OCR cache directory for the company
+        # Now, delete the entire OCR cache directory for the company. It is renamed
+        # aside first (atomic, so a new upload starts from an empty cache) and the
+        # tree is removed in the background instead of holding up the response.
         try:
-            import re
-            import shutil
-            safe_company_id = re.sub(r'[\\/*?:"<>|]', "_", company_name)
-            company_cache_dir = os.path.join(OCR_CACHE_DIR, safe_company_id)
+            company_cache_dir = get_company_cache_dir(company_name)
             if os.path.exists(company_cache_dir):
-                shutil.rmtree(company_cache_dir)
-                print(f"DEBUG: Deleted company cache directory: {company_cache_dir}")
+                trash_dir = os.path.join(OCR_CACHE_TRASH_DIR, uuid.uuid4().hex)
+                os.rename(company_cache_dir, trash_dir)
+                cleanup_executor.submit(shutil.rmtree, trash_dir, ignore_errors=True)
+                print(f"DEBUG: Deleting company cache directory in background: {company_cache_dir}")
         except Exception as e:
             print(f"ERROR: Failed to delete company cache directory for {company_name}: {e}")
 
@@ -958,20 +1403,21 @@ def delete_company_data(company_name):
             'error': f'Failed to delete company data: {error_msg}'
         }), 500
 
-@app.route('/api/companies/<company_name>/documents/<document_name>', methods=['DELETE'])
-def delete_document(company_name, document_name):
+def documents_filter(company_name, document_names):
     """
-    Delete a specific document for a company from Qdrant using doc_id
+    Filter matching every point of the given documents of one company.
+    doc_id is derived from company and file name, so it is computed rather than
+    looked up. Points from older uploads may carry a doc_id made another way, so
+    company + source is matched as well; all three fields are indexed.
     """
-    try:
-        # First, we need to get the doc_id for this document
-        # Scroll through points to find the doc_id
-        doc_id = None
-        offset = None
-        
-        while True:
-            # Create filter for the specific company and document
-            document_filter = Filter(
+    doc_ids = [generate_document_id(company_name, name) for name in document_names]
+    return Filter(
+        should=[
+            FieldCondition(
+                key="metadata.doc_id",
+                match=MatchAny(any=doc_ids)
+            ),
+            Filter(
                 must=[
                     FieldCondition(
                         key="metadata.company",
@@ -979,80 +1425,98 @@ def delete_document(company_name, document_name):
                     ),
                     FieldCondition(
                         key="metadata.source",
-                        match=MatchValue(value=document_name)
+                        match=MatchAny(any=list(document_names))
                     )
                 ]
             )
-            
-            # Fetch points with pagination
-            response = qdrant_client.scroll(
-                collection_name=QDRANT_COLLECTION,
-                limit=100,
-                offset=offset,
-                with_payload=True,
-                with_vectors=False,
-                scroll_filter=document_filter
-            )
-            
-            points, next_offset = response
-            
-            # Extract doc_id from the first point we find
-            if points and not doc_id:
-                for point in points:
-                    metadata = point.payload.get('metadata', {}) if point.payload else {}
-                    doc_id = metadata.get('doc_id')
-                    if doc_id:
-                        break
-            
-            # Break if no more points or we found the doc_id
-            if next_offset is None or doc_id:
-                break
-                
-            offset = next_offset
+        ]
+    )
+
+def remove_ocr_cache_file(company_name, document_name):
+    """Delete a document's OCR cache file, if any"""
+    try:
+        cache_path = get_ocr_cache_path(company_name, document_name)
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
+            print(f"DEBUG: Deleted OCR cache file: {cache_path}")
+    except Exception as e:
+        print(f"ERROR: Failed to delete OCR cache file for {document_name}: {e}")
+
+@app.route('/api/companies/<company_name>/documents/<document_name>', methods=['DELETE'])
+def delete_document(company_name, document_name):
+    """
+    Delete a specific document for a company from Qdrant using doc_id
+    """
+    try:
+        doc_id = generate_document_id(company_name, document_name)
+        
+        # Delete points matching the filter. Qdrant does not report how many
+        # points were removed, so a missing document is not an error here.
+        qdrant_client.delete(
+            collection_name=QDRANT_COLLECTION,
+            points_selector=documents_filter(company_name, [document_name])
+        )
+        invalidate_company_documents_cache()
+        
+        # Also delete the OCR cache file
+        remove_ocr_cache_file(company_name, document_name)
+
+        return jsonify({
+            'success': True,
+            'message': f'Successfully deleted document {document_name} with doc_id {doc_id}'
+        })
+        
+    except Exception as e:
+        error_msg = str(e)
+        return jsonify({
+            'success': False,
+            'error': f'Failed to delete document: {error_msg}'
+        }), 500
+
+@app.route('/api/companies/<company_name>/documents/bulk-delete', methods=['POST'])
+def bulk_delete_documents(company_name):
+    """
+    Delete several documents of a company from Qdrant in a single request.
+    Expects JSON with a documents list of file names.
+    """
+    try:
+        data = request.get_json() or {}
+        documents = data.get('documents', [])
         
-        if not doc_id:
+        if not documents:
             return jsonify({
                 'success': False,
-                'error': f'Document {document_name} not found for company {company_name}'
-            }), 404
+                'error': 'Missing documents'
+            }), 400
         
-        # Now delete all points with this doc_id
-        doc_filter = Filter(
-            must=[
-                FieldCondition(
-                    key="metadata.doc_id",
-                    match=MatchValue(value=doc_id)
-                )
-            ]
-        )
+        if not isinstance(documents, list) or not all(isinstance(name, str) for name in documents):
+            return jsonify({
+                'success': False,
+                'error': 'documents must be a list of file names'
+            }), 400
         
-        # Delete points matching the filter
-        response = qdrant_client.delete(
+        # One delete for the whole selection instead of one request per document
+        qdrant_client.delete(
             collection_name=QDRANT_COLLECTION,
-            points_selector=doc_filter
+            points_selector=documents_filter(company_name, documents)
         )
+        invalidate_company_documents_cache()
         
-        # The response might not have a count attribute, so we'll just return success
+        # Also delete the OCR cache files
+        for document_name in documents:
+            remove_ocr_cache_file(company_name, document_name)
         
-        # Also delete the OCR cache file
-        try:
-            cache_path = get_ocr_cache_path(company_name, document_name)
-            if os.path.exists(cache_path):
-                os.remove(cache_path)
-                print(f"DEBUG: Deleted OCR cache file: {cache_path}")
-        except Exception as e:
-            print(f"ERROR: Failed to delete OCR cache file for {document_name}: {e}")
-
         return jsonify({
             'success': True,
-            'message': f'Successfully deleted document {document_name} with doc_id {doc_id}'
+            'message': f'Successfully deleted {len(documents)} documents for company {company_name}',
+            'deleted': documents
         })
         
     except Exception as e:
         error_msg = str(e)
         return jsonify({
             'success': False,
-            'error': f'Failed to delete document: {error_msg}'
+            'error': f'Failed to delete documents: {error_msg}'
         }), 500
 
 @app.route('/health', methods=['GET'])
@@ -1121,362 +1585,360 @@ def process_documents():
         def generate():
             print("Try def block Executed")
             document_ids = []
-            try:
-                print("DEBUG: Entered generate() try block.", flush=True)
-                print(f"DEBUG: Files to process: {files}", flush=True)
-                # Process each file
-                for file_idx, file_name in enumerate(files):
-                    import urllib.parse
-                    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-                    encoded_company_id = urllib.parse.quote(company_id)
-                    encoded_file_name = urllib.parse.quote(file_name)
-                    potential_pdf_path_encoded = os.path.join(project_root, "knowledge", encoded_company_id, encoded_file_name)
-                    potential_pdf_path_original = os.path.join(project_root, "knowledge", company_id, file_name)
-                    pdf_path = None
-                    if os.path.exists(potential_pdf_path_encoded):
-                        pdf_path = potential_pdf_path_encoded
-                    elif os.path.exists(potential_pdf_path_original):
-                        pdf_path = potential_pdf_path_original
-
-                    if pdf_path is None:
-                        yield json.dumps({
-                            "status": "file_error",
-                            "file_name": file_name,
-                            "error": f"File not found: {file_name} in expected knowledge paths."
-                        }) + "\n"
-                        continue
-                    
-                    doc_id = generate_document_id(company_id, file_name)
-                    document_ids.append((doc_id, file_name))
-                    print(f"DEBUG: Generated doc_id {doc_id} for {file_name}")
-                    
-                    with processing_lock:
-                        processing_states = load_processing_states(company_id)
-                        
-                        # Update from "queued" to "processing"
-                        if doc_id in processing_states:
-                            # Preserve queued_time
-                            queued_time = processing_states[doc_id].get("queued_time")
-                            processing_states[doc_id].update({
-                                "is_processing": True,
-                                "is_queued": False,
-                                "progress": 0,
-                                "message": f"Initializing processing for {file_name}",
-                                "start_time": time.time()
-                            })
-                        else:
-                            # Fallback: create new state if not queued
-                            processing_states[doc_id] = {
-                                "doc_id": doc_id,
-                                "company_id": company_id,
-                                "file_name": file_name,
-                                "is_processing": True,
-                                "is_queued": False,
-                                "current_file": file_name,
-                                "file_index": file_idx + 1,
-                                "total_files": len(files),
-                                "progress": 0,
-                                "message": f"Initializing processing for {file_name}",
-                                "steps": {},
-                                "start_time": time.time(),
-                                "logs": []
-                            }
-                        
-                        processing_states[doc_id]["logs"].append({
-                            "timestamp": time.time(),
-                            "message": f"Started processing document {file_name}",
-                            "status": "started"
-                        })
-                        save_processing_states(company_id, processing_states)
-                    
-                    yield json.dumps({
-                        "status": "file_started",
-                        "file_index": file_idx + 1,
-                        "total_files": len(files),
-                        "currentFile": file_name,
+
+            def fetch_existing_index_names():
+                """Return the structured index names to back-fill, or None if the DB is unreachable"""
+                from db_utils import db_conn
+                with db_conn() as conn:
+                    if not conn:
+                        return None
+                    try:
+                        with conn.cursor() as cur:
+                            cur.execute("SELECT DISTINCT index_name FROM extracted_data ORDER BY index_name;")
+                            return [row[0] for row in cur.fetchall()]
+                    except Exception as e:
+                        print(f"[DB_ERROR] Failed to fetch existing index names: {e}")
+                        return []
+
+            def process_file(file_idx, file_name):
+                """Run one file through OCR -> Embedding -> Ingestion -> structured indexing"""
+                # Prefer the URL-encoded location, then the original names
+                pdf_path = None
+                for company_dir, name in ((urllib.parse.quote(company_id), urllib.parse.quote(file_name)), (company_id, file_name)):
+                    if name in knowledge_listings.get(company_dir, ()):
+                        pdf_path = os.path.join(KNOWLEDGE_DIR, company_dir, name)
+                        break
+
+                if pdf_path is None:
+                    yield _emit({
+                        "status": "file_error",
                         "file_name": file_name,
-                        "message": f"Starting processing for file {file_idx + 1}/{len(files)}: {file_name}",
-                        "progress": int(((file_idx) / len(files)) * 100)
-                    }) + "\n"
-                    
-                    # Step 1: OCR Processing
-                    with processing_lock:
-                        processing_states = load_processing_states(company_id)
-                        processing_states[doc_id]["steps"]["ocr"] = {
-                            "current_step": "ocr",
-                            "message": f"Starting OCR for {file_name}",
-                            "start_time": time.time()
-                        }
-                        processing_states[doc_id].update({
-                            "message": f"Starting OCR for {file_name}"
-                        })
-                        processing_states[doc_id]["logs"].append({
-                            "timestamp": time.time(),
-                            "message": f"Starting OCR for {file_name}",
-                            "status": "step_started",
-                            "step": "ocr"
-                        })
-                        save_processing_states(company_id, processing_states)
-                    
-                    yield json.dumps({
-                        "status": "step_started",
-                        "step": "ocr",
-                        "currentFile": file_name,
-                        "message": f"Starting OCR for {file_name}"
-                    }) + "\n"
-                    
-                    ocr_results = None
-                    ocr_pages_data = []
-                    for ocr_update in ocr_pdf_pages(pdf_path, company_id, company_id, file_name, doc_id):
-                        yield ocr_update
-                        try:
-                            update_data = json.loads(ocr_update.strip())
-                            if update_data.get("status") == "completed":
-                                ocr_results = update_data
-                                ocr_pages_data = update_data.get("pages_data", [])
-                        except:
-                            pass
-                    
-                    if not ocr_results:
-                        with processing_lock:
-                            processing_states = load_processing_states(company_id)
-                            processing_states[doc_id].update({
-                                "is_processing": False,
-                                "isError": True,
-                                "errorMessage": "OCR processing failed"
-                            })
-                            save_processing_states(company_id, processing_states)
-                        yield json.dumps({
-                            "status": "step_failed",
-                            "step": "ocr",
-                            "file_name": file_name,
-                            "error": "OCR processing failed"
-                        }) + "\n"
-                        continue
-                    
-                    chunks_data = []
-                    for page_data in ocr_pages_data:
-                        meta = {
-                            "company": company_id,
-                            "source": file_name,
-                            "page": page_data["page"],
+                        "error": f"File not found: {file_name} in expected knowledge paths."
+                    })
+                    return
+                
+                doc_id = generate_document_id(company_id, file_name)
+                document_ids.append((doc_id, file_name))
+                print(f"DEBUG: Generated doc_id {doc_id} for {file_name}")
+                
+                with processing_lock:
+                    # Fallback: create new state if not queued
+                    if doc_id not in processing_states_memory:
+                        save_processing_states(company_id, {doc_id: {
                             "doc_id": doc_id,
-                            "words": page_data["words"],
-                            "upload_time": time.time()
-                        }
-                        text_with_header = build_meta_header(meta) + page_data["text"]
-                        chunks_data.append({
-                            "text": text_with_header,
-                            "meta": meta,
-                            "page": page_data["page"]
-                        })
-                    
-                    # Step 2: Embedding Generation
-                    with processing_lock:
-                        processing_states = load_processing_states(company_id)
-                        processing_states[doc_id]["steps"]["embedding"] = {
-                            "current_step": "embedding",
-                            "message": f"Starting embedding generation for {file_name}",
-                            "start_time": time.time()
-                        }
-                        processing_states[doc_id].update({
-                            "message": f"Starting embedding generation for {file_name}"
-                        })
-                        processing_states[doc_id]["logs"].append({
-                            "timestamp": time.time(),
-                            "message": f"Starting embedding generation for {file_name}",
-                            "status": "step_started",
-                            "step": "embedding"
-                        })
-                        save_processing_states(company_id, processing_states)
-                    
-                    yield json.dumps({
-                        "status": "step_started",
-                        "step": "embedding",
-                        "currentFile": file_name,
-                        "message": f"Starting embedding generation for {file_name}"
-                    }) + "\n"
-                    
-                    embedding_results = None
-                    points_data = []
-                    for embed_update in generate_embeddings(chunks_data, doc_id):
-                        yield embed_update
-                        try:
-                            update_data = json.loads(embed_update.strip())
-                            if update_data.get("status") == "embedding_completed":
-                                embedding_results = update_data
-                                points_data = update_data.get("points_data", [])
-                        except:
-                            pass
-                    
-                    if not embedding_results:
-                        with processing_lock:
-                            processing_states = load_processing_states(company_id)
-                            processing_states[doc_id].update({
-                                "is_processing": False,
-                                "isError": True,
-                                "errorMessage": "Embedding generation failed"
-                            })
-                            save_processing_states(company_id, processing_states)
-                        yield json.dumps({
-                            "status": "step_failed",
-                            "step": "embedding",
+                            "company_id": company_id,
                             "file_name": file_name,
-                            "error": "Embedding generation failed"
-                        }) + "\n"
-                        continue
-                    
-                    # Step 3: Qdrant Ingestion
-                    with processing_lock:
-                        processing_states = load_processing_states(company_id)
-                        processing_states[doc_id]["steps"]["ingestion"] = {
-                            "current_step": "ingestion",
-                            "message": f"Starting Qdrant ingestion for {file_name}",
-                            "start_time": time.time()
-                        }
-                        processing_states[doc_id].update({
-                            "message": f"Starting Qdrant ingestion for {file_name}"
-                        })
-                        processing_states[doc_id]["logs"].append({
-                            "timestamp": time.time(),
-                            "message": f"Starting Qdrant ingestion for {file_name}",
-                            "status": "step_started",
-                            "step": "ingestion"
-                        })
-                        save_processing_states(company_id, processing_states)
-                    
-                    yield json.dumps({
-                        "status": "step_started",
-                        "step": "ingestion",
-                        "currentFile": file_name,
-                        "message": f"Starting Qdrant ingestion for {file_name}"
-                    }) + "\n"
+                            "is_processing": True,
+                            "is_queued": False,
+                            "current_file": file_name,
+                            "file_index": file_idx + 1,
+                            "total_files": len(files),
+                            "progress": 0,
+                            "message": f"Initializing processing for {file_name}",
+                            "steps": {},
+                            "start_time": time.time(),
+                            "logs": []
+                        }})
                     
-                    for ingest_update in ingest_to_qdrant(points_data, company_id, file_name):
+                    # Update from "queued" to "processing" (queued_time is preserved)
+                    log_document_event(doc_id, f"Started processing document {file_name}", "started", {
+                        "is_processing": True,
+                        "is_queued": False,
+                        "progress": 0,
+                        "message": f"Initializing processing for {file_name}",
+                        "start_time": time.time()
+                    })
+                _maybe_flush(company_id, force=True)
+                
+                yield _emit({
+                    "status": "file_started",
+                    "file_index": file_idx + 1,
+                    "total_files": len(files),
+                    "currentFile": file_name,
+                    "file_name": file_name,
+                    "message": f"Starting processing for file {file_idx + 1}/{len(files)}: {file_name}",
+                    "progress": int(((file_idx) / len(files)) * 100)
+                })
+                
+                # Step 1: OCR Processing
+                record_step_start(doc_id, "ocr", f"Starting OCR for {file_name}")
+                _maybe_flush(company_id, force=True)
+                
+                yield _emit({
+                    "status": "step_started",
+                    "step": "ocr",
+                    "currentFile": file_name,
+                    "message": f"Starting OCR for {file_name}"
+                })
+                
+                # Pages come back through ocr_results rather than the progress lines
+                ocr_results = {}
+                for ocr_update in ocr_pdf_pages(pdf_path, company_id, company_id, file_name, doc_id, result=ocr_results):
+                    yield ocr_update
+                ocr_pages_data = ocr_results.get("pages_data")
+                
+                if ocr_pages_data is None:
+                    patch_state(doc_id, {
+                        "is_processing": False,
+                        "isError": True,
+                        "errorMessage": "OCR processing failed"
+                    })
+                    _maybe_flush(company_id, force=True)
+                    yield _emit({
+                        "status": "step_failed",
+                        "step": "ocr",
+                        "file_name": file_name,
+                        "error": "OCR processing failed"
+                    })
+                    return
+                
+                chunks_data = []
+                for page_data in ocr_pages_data:
+                    meta = {
+                        "company": company_id,
+                        "source": file_name,
+                        "page": page_data["page"],
+                        "doc_id": doc_id,
+                        "words": page_data["words"],
+                        "upload_time": time.time()
+                    }
+                    text_with_header = build_meta_header(meta) + page_data["text"]
+                    chunks_data.append({
+                        "text": text_with_header,
+                        "meta": meta,
+                        "page": page_data["page"]
+                    })
+                
+                # Step 2: Embedding Generation
+                record_step_start(doc_id, "embedding", f"Starting embedding generation for {file_name}")
+                _maybe_flush(company_id, force=True)
+                
+                yield _emit({
+                    "status": "step_started",
+                    "step": "embedding",
+                    "currentFile": file_name,
+                    "message": f"Starting embedding generation for {file_name}"
+                })
+                
+                # Step 3: Qdrant Ingestion (runs alongside embedding, fed batch by batch)
+                record_step_start(doc_id, "ingestion", f"Starting Qdrant ingestion for {file_name}")
+                _maybe_flush(company_id, force=True)
+                
+                yield _emit({
+                    "status": "step_started",
+                    "step": "ingestion",
+                    "currentFile": file_name,
+                    "message": f"Starting Qdrant ingestion for {file_name}"
+                })
+                
+                # Point IDs are per doc_id and page, so re-processing overwrites the indexed
+                # version in place. In that case ingestion waits for every embedding to
+                # succeed (batches are held in an unbounded queue) so a failed run leaves
+                # the old version intact; new documents overlap the two steps.
+                replacing = document_is_indexed(doc_id)
+                points_queue = queue.Queue(maxsize=0 if replacing else INGEST_QUEUE_SIZE)
+                ingest_results = {}
+                if replacing:
+                    ingest_thread, ingest_events = None, None
+                    ingest_done = True
+                else:
+                    ingest_thread, ingest_events = start_ingestion_worker(points_queue, company_id, file_name, len(chunks_data), result=ingest_results)
+                    ingest_done = False
+                
+                embedding_results = {}
+                for embed_update in generate_embeddings(chunks_data, doc_id, points_queue=points_queue, result=embedding_results):
+                    yield embed_update
+                    while not ingest_done:
+                        try:
+                            ingest_update = ingest_events.get_nowait()
+                        except queue.Empty:
+                            break
+                        if ingest_update is None:
+                            ingest_done = True
+                        else:
+                            yield ingest_update
+                
+                if replacing and embedding_results:
+                    ingest_thread, ingest_events = start_ingestion_worker(points_queue, company_id, file_name, len(chunks_data), result=ingest_results)
+                    ingest_done = False
+                
+                # Wait for the ingestion worker to finish the remaining batches
+                while not ingest_done:
+                    ingest_update = ingest_events.get()
+                    if ingest_update is None:
+                        ingest_done = True
+                    elif embedding_results:
                         yield ingest_update
-                    
-                    with processing_lock:
-                        processing_states = load_processing_states(company_id)
-                        processing_states[doc_id].update({
-                            "message": f"Completed processing for {file_name}",
-                            "progress": int(((file_idx + 1) / len(files)) * 100)
-                        })
-                        processing_states[doc_id]["logs"].append({
-                            "timestamp": time.time(),
-                            "message": f"Completed processing for {file_name}",
-                            "status": "file_completed"
-                        })
-                        save_processing_states(company_id, processing_states)
-                    
-                    yield json.dumps({
-                        "status": "file_completed",
-                        "file_index": file_idx + 1,
-                        "currentFile": file_name,
+                if ingest_thread is not None:
+                    ingest_thread.join()
+                
+                if not embedding_results:
+                    # Roll back only the points this run sent; a new document has no others
+                    ingested_ids = ingest_results.get("point_ids")
+                    if ingested_ids:
+                        try:
+                            qdrant_client.delete(
+                                collection_name=QDRANT_COLLECTION,
+                                points_selector=PointIdsList(points=ingested_ids)
+                            )
+                        except Exception as rollback_error:
+                            print(f"ERROR: Failed to roll back partial ingestion for {file_name}: {rollback_error}")
+                        invalidate_company_documents_cache()
+                    patch_state(doc_id, {
+                        "is_processing": False,
+                        "isError": True,
+                        "errorMessage": "Embedding generation failed"
+                    })
+                    _maybe_flush(company_id, force=True)
+                    yield _emit({
+                        "status": "step_failed",
+                        "step": "embedding",
                         "file_name": file_name,
-                        "message": f"Completed processing for {file_name}",
-                        "progress": int(((file_idx + 1) / len(files)) * 100)
-                    }) + "\n"
-                    
-                    # Step 4 here for manual indexing?
-                    from manual_indexer import index_single_document
-                    from db_utils import get_db_connection
-
-                    yield json.dumps({
-                        "status": "step_started",
+                        "error": "Embedding generation failed"
+                    })
+                    return
+                
+                log_document_event(doc_id, f"Completed processing for {file_name}", "file_completed", {
+                    "progress": int(((file_idx + 1) / len(files)) * 100)
+                })
+                _maybe_flush(company_id, force=True)
+                
+                yield _emit({
+                    "status": "file_completed",
+                    "file_index": file_idx + 1,
+                    "currentFile": file_name,
+                    "file_name": file_name,
+                    "message": f"Completed processing for {file_name}",
+                    "progress": int(((file_idx + 1) / len(files)) * 100)
+                })
+                
+                # Step 4 here for manual indexing?
+                if not existing_index_names:
+                    if existing_index_names is None:
+                        print(f"[DB_ERROR] Could not connect to DB for structured indexing of {file_name}.")
+                    else:
+                        print(f"INFO: No existing structured indexes to process for {file_name}.")
+                    yield _emit({
+                        "status": "step_skipped",
                         "step": "structured_indexing",
                         "currentFile": file_name,
-                        "message": f"Starting automatic structured indexing for {file_name}"
-                    }) + "\n"
+                        "message": f"No structured indexes to back-fill for {file_name}"
+                    })
+                    return
 
-                    db_conn = get_db_connection()
-                    if not db_conn:
-                        print(f"[DB_ERROR] Could not connect to DB for structured indexing of {file_name}.")
-                        continue # Go to the next file in the list
+                from manual_indexer import index_single_document
+
+                yield _emit({
+                    "status": "step_started",
+                    "step": "structured_indexing",
+                    "currentFile": file_name,
+                    "message": f"Starting automatic structured indexing for {file_name}"
+                })
+
+                print(f"DEBUG: Found {len(existing_index_names)} existing indexes. Back-filling for {file_name}.")
+                status_callback = lambda msg_data: notify_processing_update(msg_data) if isinstance(msg_data, dict) else notify_processing_update({'type': 'indexing_status', 'message': msg_data})
+                # Indexes are independent, so back-fill up to BACKFILL_CONCURRENCY at once.
+                # index_single_document (manual_indexer.py) handles its own logic and errors.
+                with ThreadPoolExecutor(max_workers=min(BACKFILL_CONCURRENCY, len(existing_index_names)), thread_name_prefix="Backfill") as backfill_pool:
+                    list(backfill_pool.map(
+                        lambda index_name: index_single_document(company_id, file_name, index_name, status_callback=status_callback),
+                        existing_index_names
+                    ))
+
+                yield _emit({
+                    "status": "step_completed",
+                    "step": "structured_indexing",
+                    "currentFile": file_name,
+                    "message": f"Completed automatic structured indexing for {file_name}"
+                })
 
+            try:
+                print("DEBUG: Entered generate() try block.", flush=True)
+                print(f"DEBUG: Files to process: {files}", flush=True)
+                # One DB round trip for the whole job instead of a connection per file
+                existing_index_names = fetch_existing_index_names()
+                # List the company's knowledge folder(s) once instead of a stat per file
+                knowledge_listings = {}
+                for company_dir in {urllib.parse.quote(company_id), company_id}:
                     try:
-                        with db_conn.cursor() as cur:
-                            cur.execute("SELECT DISTINCT index_name FROM extracted_data ORDER BY index_name;")
-                            existing_index_names = [row[0] for row in cur.fetchall()]
-                    except Exception as e:
-                        print(f"[DB_ERROR] Failed to fetch existing index names: {e}")
-                        existing_index_names = []
+                        knowledge_listings[company_dir] = set(os.listdir(os.path.join(KNOWLEDGE_DIR, company_dir)))
+                    except OSError:
+                        knowledge_listings[company_dir] = set()
+                # Process each file, up to FILE_CONCURRENCY at once; each worker
+                # pushes its progress lines onto a shared queue drained here.
+                file_events = queue.Queue()
+
+                def run_file(file_idx, file_name):
+                    try:
+                        for update in process_file(file_idx, file_name):
+                            file_events.put(update)
+                    except Exception as file_error:
+                        print(f"ERROR processing {file_name}: {file_error}")
+                        traceback.print_exc()
+                        patch_state(generate_document_id(company_id, file_name), {
+                            "is_processing": False,
+                            "isError": True,
+                            "errorMessage": str(file_error)
+                        })
+                        _maybe_flush(company_id, force=True)
+                        file_events.put(_emit({
+                            "status": "file_error",
+                            "file_name": file_name,
+                            "error": str(file_error)
+                        }))
                     finally:
-                        db_conn.close()
-
-                    if existing_index_names:
-                        print(f"DEBUG: Found {len(existing_index_names)} existing indexes. Back-filling for {file_name}.")
-                        for index_name in existing_index_names:
-                            # This function is in manual_indexer.py and handles its own logic
-                            index_single_document(company_id, file_name, index_name, status_callback=lambda msg_data: notify_processing_update(msg_data) if isinstance(msg_data, dict) else notify_processing_update({'type': 'indexing_status', 'message': msg_data}))
-                    else:
-                        print(f"INFO: No existing structured indexes to process for {file_name}.")
+                        file_events.put(None)
+
+                with ThreadPoolExecutor(max_workers=FILE_CONCURRENCY, thread_name_prefix="FilePipeline") as file_pool:
+                    for file_idx, file_name in enumerate(files):
+                        file_pool.submit(run_file, file_idx, file_name)
+                    remaining = len(files)
+                    while remaining:
+                        update = file_events.get()
+                        if update is None:
+                            remaining -= 1
+                        else:
+                            yield update
 
-                    yield json.dumps({
-                        "status": "step_completed",
-                        "step": "structured_indexing",
-                        "currentFile": file_name,
-                        "message": f"Completed automatic structured indexing for {file_name}"
-                    }) + "\n"
-                        
-                
-                with processing_lock:
-                    processing_states = load_processing_states(company_id)
-                    for doc_id, file_name in document_ids:
-                        if doc_id in processing_states:
-                            processing_states[doc_id].update({
-                                "is_processing": False,
-                                "message": f"Completed processing all {len(files)} files",
-                                "progress": 100,
-                                "completion_time": time.time()
-                            })
-                            processing_states[doc_id]["logs"].append({
-                                "timestamp": time.time(),
-                                "message": f"Completed processing all {len(files)} files",
-                                "status": "all_completed"
-                            })
-                    save_processing_states(company_id, processing_states)
+                for doc_id, file_name in document_ids:
+                    log_document_event(doc_id, f"Completed processing all {len(files)} files", "all_completed", {
+                        "is_processing": False,
+                        "progress": 100,
+                        "completion_time": time.time()
+                    })
+                _maybe_flush(company_id, force=True)
                 
                 # Removed automatic Qdrant data refresh - user will manually refresh if needed
                 # notify_qdrant_data_update("file_management")
 
-                yield json.dumps({
+                yield _emit({
                     "status": "all_completed",
                     "currentFile": None,
                     "message": f"Completed processing all {len(files)} files",
                     "files_processed": len(files),
                     "progress": 100
-                }) + "\n"
+                })
             
             except Exception as e:
                 error_traceback = traceback.format_exc()
                 print(f"ERROR in document processing generator: {str(e)}")
                 print(f"Traceback: {error_traceback}")
-                with processing_lock:
-                    processing_states = load_processing_states(company_id)
-                    for doc_id, file_name in document_ids:
-                        if doc_id in processing_states:
-                            try:
-                                processing_states[doc_id].update({
-                                    "is_processing": False,
-                                    "isError": True,
-                                    "errorMessage": str(e),
-                                    "completion_time": time.time()
-                                })
-                                processing_states[doc_id]["logs"].append({
-                                    "timestamp": time.time(),
-                                    "message": f"Processing failed: {str(e)}",
-                                    "status": "process_error",
-                                    "error": str(e),
-                                    "traceback": error_traceback
-                                })
-                            except Exception as gen_error:
-                                print(f"ERROR updating state in generator: {str(gen_error)}")
-                    save_processing_states(company_id, processing_states)
+                for doc_id, file_name in document_ids:
+                    try:
+                        log_document_event(doc_id, f"Processing failed: {str(e)}", "process_error", {
+                            "is_processing": False,
+                            "isError": True,
+                            "errorMessage": str(e),
+                            "completion_time": time.time()
+                        }, error=str(e), traceback=error_traceback)
+                    except Exception as gen_error:
+                        print(f"ERROR updating state in generator: {str(gen_error)}")
+                _maybe_flush(company_id, force=True)
                 
-                yield json.dumps({
+                yield _emit({
                     "status": "process_error",
                     "error": f"Processing failed: {str(e)}"
-                }) + "\n"
+                })
             
             finally:
                 # Clean up processing states from memory
@@ -1553,28 +2015,33 @@ def process_documents():
         print(f"Traceback: {error_traceback}")
         
         if 'company_id' in locals() and 'files' in locals():
+            # Hash the IDs and build the shared fields before taking the lock
+            doc_ids = []
+            for file_name in files:
+                try:
+                    doc_ids.append(generate_document_id(company_id, file_name))
+                except Exception as gen_error:
+                    print(f"ERROR generating doc_id: {str(gen_error)}")
+            now = time.time()
+            error_updates = {
+                "is_processing": False,
+                "isError": True,
+                "errorMessage": str(e),
+                "completion_time": now
+            }
+            error_log = {
+                "timestamp": now,
+                "message": f"Failed to start processing: {str(e)}",
+                "status": "start_error",
+                "error": str(e),
+                "traceback": error_traceback
+            }
+            # Patch the states in place under a single lock acquisition
             with processing_lock:
-                processing_states = load_processing_states(company_id)
-                for file_name in files:
-                    try:
-                        doc_id = generate_document_id(company_id, file_name)
-                        if doc_id in processing_states:
-                            processing_states[doc_id].update({
-                                "is_processing": False,
-                                "isError": True,
-                                "errorMessage": str(e),
-                                "completion_time": time.time()
-                            })
-                            processing_states[doc_id]["logs"].append({
-                                "timestamp": time.time(),
-                                "message": f"Failed to start processing: {str(e)}",
-                                "status": "start_error",
-                                "error": str(e),
-                                "traceback": error_traceback
-                            })
-                    except Exception as gen_error:
-                        print(f"ERROR generating doc_id or updating state: {str(gen_error)}")
-                save_processing_states(company_id, processing_states)
+                for doc_id in doc_ids:
+                    if patch_state(doc_id, error_updates):
+                        processing_states_memory[doc_id].setdefault("logs", []).append(dict(error_log))
+            _maybe_flush(company_id, force=True)
             
         return jsonify({
             'success': False,
@@ -1643,37 +2110,105 @@ def get_document_processing_states():
     Returns all active processing states across all companies.
     """
     with processing_lock:
-        # Return a copy to prevent external modification
-        all_states = processing_states_memory.copy()
+        # The in-memory dict is the cache: serialize it directly while holding the
+        # lock (the pipeline mutates states in place) instead of copying it first
+        active_count = sum(1 for state in processing_states_memory.values() if state.get("is_processing"))
         
-        # Count active processing jobs
-        active_count = sum(1 for state in all_states.values() if state.get("is_processing"))
+        print(f"📊 STATES REQUESTED: {len(processing_states_memory)} total states ({active_count} active)")
         
-        print(f"📊 STATES REQUESTED: {len(all_states)} total states ({active_count} active)")
-        
-        return jsonify(all_states)
+        return json_response(processing_states_memory)
 
 # Global variables for SSE
-processing_listeners = set()
+# Copy-on-write: connects/disconnects swap in a new frozenset under
+# processing_listeners_lock, so the notifier reads the current set without
+# locking or copying it per update
+processing_listeners = frozenset()
+processing_listeners_lock = threading.Lock()
+# Max undelivered messages per SSE client
+LISTENER_QUEUE_SIZE = 256
+# Seconds between SSE keep-alive comments on an idle stream
+SSE_KEEPALIVE = int(os.getenv("SSE_KEEPALIVE", "25"))
+# Keep-alives are stretched as clients pile up, but stay under common 60s proxy idle timeouts
+SSE_KEEPALIVE_MAX = int(os.getenv("SSE_KEEPALIVE_MAX", "55"))
+SSE_CLIENTS_PER_KEEPALIVE_STEP = 100
+# Reconnect delay advertised to EventSource clients, in milliseconds
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", "15000"))
+
+def sse_keepalive_interval():
+    """Keep-alive interval for the current number of connected SSE clients."""
+    step = 1 + len(processing_listeners) // SSE_CLIENTS_PER_KEEPALIVE_STEP
+    return min(SSE_KEEPALIVE * step, max(SSE_KEEPALIVE, SSE_KEEPALIVE_MAX))
+
+# Updates are queued by notify_processing_update() and fanned out by a single
+# notifier thread, so the pipeline never waits on serialization or listeners.
+# Updates arriving within NOTIFY_COALESCE_WINDOW seconds are sent as one batch,
+# with consecutive updates of the same type merged where that loses nothing.
+NOTIFY_COALESCE_WINDOW = 0.05
+_notify_queue = queue.Queue()
 
 def notify_processing_update(data):
-    """Notify all listeners of a processing update"""
+    """Notify all listeners of a processing update (non-blocking)"""
+    _notify_queue.put_nowait(data)
+
+def _coalesce_updates(updates):
+    """Merge consecutive states_updated messages and keep only the last of consecutive qdrant_data_updated snapshots"""
+    merged = []
+    for data in updates:
+        last = merged[-1] if merged else None
+        if last is not None and last.get("type") == data.get("type"):
+            if data.get("type") == "states_updated":
+                merged[-1] = {**last, "states": {**last["states"], **data["states"]}}
+                continue
+            if data.get("type") == "qdrant_data_updated":
+                merged[-1] = data
+                continue
+        merged.append(data)
+    return merged
+
+def _broadcast_update(data):
+    """Serialize one update and put it on every listener's queue"""
+    global processing_listeners
+    listeners = processing_listeners
+    if not listeners:
+        return
+    
+    # States are mutated in place by the pipeline, so serialize under its lock
     with processing_lock:
-        # Create a copy of the listeners set to avoid modification during iteration
-        listeners = processing_listeners.copy()
+        message = _dumps(data)
     
-    # Send update to all listeners
+    # Send update to all listeners; a client that has fallen LISTENER_QUEUE_SIZE
+    # messages behind is evicted rather than buffered without bound
     disconnected = set()
     for listener_queue in listeners:
         try:
-            listener_queue.put(json.dumps(data))
-        except:
+            listener_queue.put_nowait(message)
+        except queue.Full:
             disconnected.add(listener_queue)
     
     # Remove disconnected listeners
     if disconnected:
-        with processing_lock:
-            processing_listeners.difference_update(disconnected)
+        with processing_listeners_lock:
+            processing_listeners = processing_listeners - disconnected
+
+def _notifier_loop():
+    while True:
+        updates = [_notify_queue.get()]
+        deadline = time.time() + NOTIFY_COALESCE_WINDOW
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                updates.append(_notify_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        for data in _coalesce_updates(updates):
+            try:
+                _broadcast_update(data)
+            except Exception as e:
+                print(f"ERROR: Failed to broadcast processing update: {e}")
+
+threading.Thread(target=_notifier_loop, name="ProcessingNotifier", daemon=True).start()
 
 # SSE endpoint for processing updates
 @app.route('/events/processing-updates')
@@ -1681,14 +2216,16 @@ def processing_updates():
     """Server-Sent Events endpoint for real-time processing updates"""
     def event_stream():
         # Create a queue for this connection
-        import queue
-        listener_queue = queue.Queue()
+        listener_queue = queue.Queue(maxsize=LISTENER_QUEUE_SIZE)
         
+        global processing_listeners
         # Add this connection to listeners
-        with processing_lock:
-            processing_listeners.add(listener_queue)
+        with processing_listeners_lock:
+            processing_listeners = processing_listeners | {listener_queue}
         
         try:
+            # Tell the browser how long to wait before reconnecting
+            yield f"retry: {SSE_RETRY_MS}\n\n"
             # Send initial connection message
             yield f"data: {json.dumps({'type': 'connected', 'message': 'Connected to processing updates'})}\n\n"
             
@@ -1696,39 +2233,82 @@ def processing_updates():
             while True:
                 try:
                     # Wait for update (with timeout to keep connection alive)
-                    data = listener_queue.get(timeout=25)
+                    data = listener_queue.get(timeout=sse_keepalive_interval())
                     yield f"data: {data}\n\n"
                 except queue.Empty:
+                    if listener_queue not in processing_listeners:
+                        # Evicted for falling behind; end the stream so the client
+                        # reconnects and resyncs
+                        break
                     # Send keep-alive
                     yield ": keep-alive\n\n"
         except GeneratorExit:
             pass
         finally:
             # Remove this connection from listeners
-            with processing_lock:
-                processing_listeners.discard(listener_queue)
+            with processing_listeners_lock:
+                processing_listeners = processing_listeners - {listener_queue}
     
-    return Response(event_stream(), mimetype="text/event-stream")
+    # Every event must reach the browser as soon as it is yielded: stop reverse
+    # proxies (nginx) and caches from buffering the stream
+    return Response(event_stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
 
 from manual_indexer import index_company_worker
 
 # Load the N8N API Key from environment variables
 N8N_API_KEY = os.getenv("API_BEARER_TOKEN")
 
+# create-index status messages go through a logging queue, so worker threads only
+# enqueue a record; %-formatting, printing and the SSE notify happen on the
+# listener thread. manual_indexer builds its messages itself, so only the
+# orchestrator's own messages benefit from the deferred formatting.
+INDEXING_LOG_QUEUE_SIZE = 1000
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that enqueues records as they are, leaving formatting to the
+    listener thread, and blocks instead of dropping when the queue is full.
+    """
+    def prepare(self, record):
+        return record
+    
+    def enqueue(self, record):
+        self.queue.put(record)
+
+class IndexingStatusHandler(logging.Handler):
+    """Forwards indexing status records to SSE listeners."""
+    def emit(self, record):
+        notify_processing_update({"type": "indexing_status", "message": record.getMessage()})
+
+indexing_logger = logging.getLogger("indexing")
+indexing_logger.setLevel(logging.INFO)
+indexing_logger.propagate = False
+_indexing_log_queue = queue.Queue(maxsize=INDEXING_LOG_QUEUE_SIZE)
+indexing_logger.addHandler(DeferredQueueHandler(_indexing_log_queue))
+_indexing_stdout_handler = logging.StreamHandler(sys.stdout)
+_indexing_stdout_handler.setFormatter(logging.Formatter("[INDEXING_STATUS] %(message)s"))
+indexing_log_listener = logging.handlers.QueueListener(
+    _indexing_log_queue, _indexing_stdout_handler, IndexingStatusHandler()
+)
+indexing_log_listener.start()
+
 @app.route('/api/create-index', methods=['POST'])
 def create_index_endpoint():
     """
     API endpoint to start a full manual indexing job, protected by an API key.
     Expects 'Authorization: Bearer <YOUR_API_KEY>' in the header.
     """
-    # API Key Authentication
+    # API Key Authentication (needs `import hmac` when re-enabled)
     # if N8N_API_KEY:
     #     auth_header = request.headers.get('Authorization')
     #     if not auth_header or not auth_header.startswith('Bearer '):
     #         return jsonify({'success': False, 'error': 'Authorization header is missing or invalid'}), 401
         
     #     token = auth_header.split(' ')[1]
-    #     if token != N8N_API_KEY:
+    #     if not hmac.compare_digest(token.encode('utf-8'), N8N_API_KEY.encode('utf-8')):
     #         return jsonify({'success': False, 'error': 'Invalid API Key'}), 401
 
     # --- Original logic continues if authentication is successful ---
@@ -1740,21 +2320,11 @@ def create_index_endpoint():
 
     def job_orchestrator():
         """Discovers companies and launches a worker thread for each."""
-        # Define the central output file
-        output_file_path = os.path.join(project_root, "backend", "indexing_results.json")
-        # Create a shared lock for file access
-        file_lock = threading.RLock()
+        def status_callback(message, *args):
+            # %-style args are formatted on the log listener thread
+            indexing_logger.info(message, *args)
 
-        # Clear the old results file at the start of a new job
-        if os.path.exists(output_file_path):
-            os.remove(output_file_path)
-
-        def status_callback(message):
-            # Add a timestamp to the message for clearer logging on the server
-            print(f"[INDEXING_STATUS] {message}")
-            notify_processing_update({"type": "indexing_status", "message": message})
-
-        status_callback(f"Job started for index: '{index_name}'. Discovering companies...")
+        status_callback("Job started for index: '%s'. Discovering companies...", index_name)
 
         try:
             ocr_cache_base_dir = os.path.join(project_root, "backend", "ocr_cache")
@@ -1762,32 +2332,40 @@ def create_index_endpoint():
                 status_callback("ERROR: OCR cache directory not found.")
                 return
 
-            company_dirs = [d for d in os.listdir(ocr_cache_base_dir) if os.path.isdir(os.path.join(ocr_cache_base_dir, d))]
+            with os.scandir(ocr_cache_base_dir) as entries:
+                company_dirs = [entry.name for entry in entries if entry.is_dir()]
             
             if not company_dirs:
                 status_callback("INFO: No companies found in OCR cache. Job complete.")
                 return
 
-            status_callback(f"Found {len(company_dirs)} companies. Launching workers...")
-
-            threads = []
-            for company_name in company_dirs:
-                thread = threading.Thread(
-                    target=index_company_worker,
-                    args=(company_name, index_name, output_file_path, file_lock, status_callback)
-                )
-                threads.append(thread)
-                thread.start()
+            status_callback("Found %d companies. Launching workers...", len(company_dirs))
 
-            # Wait for all threads to complete
-            for thread in threads:
-                thread.join()
+            # At most INDEXING_WORKERS companies are indexed at once; the rest wait in the pool's queue
+            with ThreadPoolExecutor(max_workers=INDEXING_WORKERS, thread_name_prefix="IndexWorker") as index_pool:
+                futures = {
+                    index_pool.submit(index_company_worker, company_name, index_name, status_callback, save_to_db=False): company_name
+                    for company_name in company_dirs
+                }
+                # Wait for all workers to complete, collecting their results in memory
+                results_by_company = {}
+                for future in as_completed(futures):
+                    company_results = future.result()
+                    if company_results:
+                        results_by_company[futures[future]] = company_results
+
+            # Save every company's results in one batched insert instead of one per worker
+            with db_conn() as conn:
+                if conn:
+                    create_table_if_not_exists(conn)
+                    insert_extracted_data_for_companies(conn, results_by_company)
+                else:
+                    status_callback("ERROR: Could not connect to DB to save results for %d companies.", len(results_by_company))
 
             # Check if any index was found across all companies
             any_index_found = False
-            conn = get_db_connection()
-            if conn:
-                try:
+            with db_conn() as conn:
+                if conn:
                     with conn.cursor() as cur:
                         cur.execute(
                             "SELECT COUNT(*) FROM extracted_data WHERE index_name = %s AND result IS NOT NULL AND result::text != %s",
@@ -1795,14 +2373,11 @@ def create_index_endpoint():
                         )
                         count = cur.fetchone()[0]
                         any_index_found = count > 0
-                finally:
-                    conn.close()
 
             # If no index was found anywhere, add a single "No deep search found on this index" record
             if not any_index_found:
-                conn = get_db_connection()
-                if conn:
-                    try:
+                with db_conn() as conn:
+                    if conn:
                         with conn.cursor() as cur:
                             # Generate a unique document_id for this aggregate record
                             import hashlib
@@ -1813,55 +2388,120 @@ def create_index_endpoint():
                                 (document_id, "", index_name, index_name, '"No deep search found on this index"')
                             )
                             conn.commit()
-                    finally:
-                        conn.close()
 
             status_callback("SUCCESS: All company workers have finished. Job complete.")
         except Exception as e:
             # Broad exception to catch any error during orchestration
-            error_message = f"FATAL_ERROR: The indexing job failed during orchestration. Error: {str(e)}"
-            status_callback(error_message)
-            print(error_message) # Also print to server logs for debugging
+            status_callback("FATAL_ERROR: The indexing job failed during orchestration. Error: %s", e)
 
-    # Run the entire orchestration in a single background thread
-    orchestrator_thread = threading.Thread(target=job_orchestrator)
-    orchestrator_thread.daemon = True
-    orchestrator_thread.start()
+    # Run the entire orchestration on the shared indexing job pool
+    index_job_executor.submit(job_orchestrator)
 
     return jsonify({'success': True, 'message': f'Indexing job launched for: {index_name}'}), 202
 
-from db_utils import get_db_connection
+from db_utils import db_conn, get_pooled_connection, release_db_connection, create_table_if_not_exists, insert_extracted_data_for_companies, CREATED_AT_SORT_KEY
+from psycopg2.extras import RealDictCursor
+
+# created_at is formatted as ISO 8601 by the database (same shape as isoformat())
+ALL_DATA_COLUMNS = (
+    "id, company_name, file_name, index_name, result, "
+    "to_char(created_at, 'YYYY-MM-DD\"T\"HH24:MI:SS.USTZH:TZM') AS created_at"
+)
+
+def encode_data_cursor(row):
+    """Opaque keyset cursor for the row a page ended on (a NULL created_at encodes as -infinity, like CREATED_AT_SORT_KEY)."""
+    raw = f"{row['created_at'] or '-infinity'}|{row['id']}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_data_cursor(cursor):
+    """Inverse of encode_data_cursor; raises ValueError on malformed input."""
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').rsplit('|', 1)
+        return created_at, int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def get_data_page(limit, cursor):
+    """
+    Keyset-paginated variant of /api/get-all-data, used when ?limit= is given.
+    Pages are ordered by (CREATED_AT_SORT_KEY, id) descending, which the
+    extracted_data_created_at_id_idx index serves; next_cursor is null on the last page.
+    """
+    try:
+        limit = max(1, min(int(limit), ALL_DATA_MAX_PAGE_SIZE))
+        after = decode_data_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    with db_conn() as conn:
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                where = f"WHERE ({CREATED_AT_SORT_KEY}, id) < (%s::timestamptz, %s) " if after else ""
+                # One extra row tells us whether another page follows
+                cur.execute(
+                    f"SELECT {ALL_DATA_COLUMNS} FROM extracted_data {where}"
+                    f"ORDER BY {CREATED_AT_SORT_KEY} DESC, id DESC LIMIT %s;",
+                    (*after, limit + 1) if after else (limit + 1,)
+                )
+                rows = cur.fetchall()
+            next_cursor = encode_data_cursor(rows[limit - 1]) if len(rows) > limit else None
+            return json_response({'success': True, 'data': rows[:limit], 'next_cursor': next_cursor})
+        except Exception as e:
+            print(f"[DB_ERROR] Failed to fetch data page: {e}")
+            return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/get-all-data', methods=['GET'])
 def get_all_data():
-    """Fetches all records from the extracted_data table for debugging."""
-    conn = get_db_connection()
+    """
+    Fetches all records from the extracted_data table for debugging.
+    Rows are read through a server-side cursor and streamed out as they arrive,
+    so memory stays bounded by ALL_DATA_FETCH_SIZE rows regardless of table size.
+    The response body is the same {"success": true, "data": [...]} document.
+
+    Passing ?limit=N (optionally with ?cursor=<next_cursor>) returns a single
+    keyset-paginated page instead, with a next_cursor field.
+    """
+    limit = request.args.get('limit')
+    if limit is not None:
+        return get_data_page(limit, request.args.get('cursor'))
+
+    # Borrowed for the lifetime of the stream; returned to the pool when it ends
+    conn = get_pooled_connection()
     if not conn:
         return jsonify({'success': False, 'error': 'Database connection failed'}), 500
 
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id, company_name, file_name, index_name, result, created_at FROM extracted_data ORDER BY created_at DESC;")
-            rows = cur.fetchall()
-            
-            # Get column names from the cursor description
-            column_names = [desc[0] for desc in cur.description]
-            
-            # Convert rows to a list of dictionaries
-            data = [dict(zip(column_names, row)) for row in rows]
-
-            # Convert datetime objects to ISO format strings
-            for row in data:
-                if 'created_at' in row and hasattr(row['created_at'], 'isoformat'):
-                    row['created_at'] = row['created_at'].isoformat()
-
-            return jsonify({'success': True, 'data': data})
+        # RealDictCursor builds each row as a dict while fetching, no zip() pass needed
+        cur = conn.cursor(name='stream_all_data', cursor_factory=RealDictCursor)
+        cur.itersize = ALL_DATA_FETCH_SIZE
+        cur.execute(f"SELECT {ALL_DATA_COLUMNS} FROM extracted_data ORDER BY extracted_data.created_at DESC;")
+        # Named cursors only fetch (and describe) on first iteration
+        first_rows = cur.fetchmany(ALL_DATA_FETCH_SIZE)
     except Exception as e:
         print(f"[DB_ERROR] Failed to fetch data: {e}")
+        release_db_connection(conn)
         return jsonify({'success': False, 'error': str(e)}), 500
-    finally:
-        if conn:
-            conn.close()
+
+    def generate():
+        try:
+            yield b'{"success":true,"data":['
+            first = True
+            for rows in (first_rows, cur):
+                for row in rows:
+                    yield (b'' if first else b',') + _dumps(row).encode('utf-8')
+                    first = False
+            yield b']}'
+        except Exception as e:
+            # Headers are already sent; log and end the (now invalid) document
+            print(f"[DB_ERROR] Failed while streaming data: {e}")
+        finally:
+            cur.close()
+            release_db_connection(conn)
+
+    return Response(generate(), mimetype='application/json')
 
 @app.route('/api/list-indexes', methods=['GET'])
 def list_indexes():
@@ -1869,21 +2509,18 @@ def list_indexes():
     API endpoint to list all unique index names present in the extracted_data table.
     No authentication required.
     """
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+    with db_conn() as conn:
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
 
-    try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT DISTINCT index_name FROM extracted_data ORDER BY index_name;")
-            index_names = [row[0] for row in cur.fetchall()]
-            return jsonify({'index_names': index_names})
-    except Exception as e:
-        print(f"[DB_ERROR] Failed to fetch index names: {e}")
-        return jsonify({'success': False, 'error': str(e)}), 500
-    finally:
-        if conn:
-            conn.close()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT DISTINCT index_name FROM extracted_data ORDER BY index_name;")
+                index_names = [row[0] for row in cur.fetchall()]
+                return jsonify({'index_names': index_names})
+        except Exception as e:
+            print(f"[DB_ERROR] Failed to fetch index names: {e}")
+            return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/index/<string:index_name>', methods=['DELETE'])
 def delete_index(index_name):
@@ -1891,24 +2528,21 @@ def delete_index(index_name):
     Deletes all data associated with a specific index_name from the database.
     (Authentication temporarily removed for testing/debugging purposes)
     """
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+    with db_conn() as conn:
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
 
-    try:
-        with conn.cursor() as cur:
-            cur.execute("DELETE FROM extracted_data WHERE index_name = %s;", (index_name,))
-            conn.commit()
-            deleted_count = cur.rowcount
-            print(f"[DB_INFO] Deleted {deleted_count} rows for index_name: {index_name}")
-            return jsonify({'success': True, 'message': f'Successfully deleted {deleted_count} records for index \'{index_name}\''})
-    except Exception as e:
-        conn.rollback()
-        print(f"[DB_ERROR] Failed to delete index data: {e}")
-        return jsonify({'success': False, 'error': str(e)}), 500
-    finally:
-        if conn:
-            conn.close()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM extracted_data WHERE index_name = %s;", (index_name,))
+                conn.commit()
+                deleted_count = cur.rowcount
+                print(f"[DB_INFO] Deleted {deleted_count} rows for index_name: {index_name}")
+                return jsonify({'success': True, 'message': f'Successfully deleted {deleted_count} records for index \'{index_name}\''})
+        except Exception as e:
+            conn.rollback()
+            print(f"[DB_ERROR] Failed to delete index data: {e}")
+            return jsonify({'success': False, 'error': str(e)}), 500
 
 # --- Existing SSE and other routes ---
 
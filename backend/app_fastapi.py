@@ -541,11 +541,6 @@ async def create_index_endpoint(request: CreateIndexRequest):
         from db_utils import get_db_connection
         
         project_root = get_project_root()
-        output_file_path = os.path.join(project_root, "backend", "indexing_results.json")
-        file_lock = threading.RLock()
-
-        if os.path.exists(output_file_path):
-            os.remove(output_file_path)
 
         def status_callback(message):
             print(f"[INDEXING_STATUS] {message}")
@@ -571,7 +566,7 @@ async def create_index_endpoint(request: CreateIndexRequest):
             for company_name in company_dirs:
                 thread = threading.Thread(
                     target=index_company_worker,
-                    args=(company_name, index_name, output_file_path, file_lock, status_callback)
+                    args=(company_name, index_name, status_callback)
                 )
                 threads.append(thread)
                 thread.start()
@@ -1,8 +1,11 @@
 
 import os
 import psycopg2
+import psycopg2.pool
 import hashlib
 import json
+import threading
+from contextlib import contextmanager
 from psycopg2.extras import execute_values
 from dotenv import load_dotenv
 
@@ -33,7 +36,78 @@ def get_db_connection():
         print(f"[DB_ERROR] Could not connect to the database: {e}")
         return None
 
+# --- Connection Pool ---
+# Upper bound on pooled connections held open by one server process. Callers beyond
+# it wait (up to DB_POOL_TIMEOUT seconds) for a connection to be released instead of
+# failing; see INDEXING_WORKERS in app.py for how the worker counts relate to it.
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "32"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+_pool = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPool.getconn() raises instead of blocking once DB_POOL_MAX
+# connections are out, so borrowers take a slot here first
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+
+def _get_pool():
+    """Create the shared connection pool on first use, so importing never needs the database."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = psycopg2.pool.ThreadedConnectionPool(
+                    DB_POOL_MIN,
+                    DB_POOL_MAX,
+                    dbname=DB_NAME,
+                    user=DB_USER,
+                    password=DB_PASSWORD,
+                    host=DB_HOST,
+                    port=DB_PORT
+                )
+    return _pool
+
+def get_pooled_connection(timeout=DB_POOL_TIMEOUT):
+    """
+    Borrows a connection from the shared pool, waiting up to timeout seconds while all
+    DB_POOL_MAX connections are in use. Returns None if the wait times out or the
+    database cannot be reached. Hand it back with release_db_connection() instead of closing it.
+    """
+    if not _pool_slots.acquire(timeout=timeout):
+        print(f"[DB_ERROR] No pooled database connection became free within {timeout}s.")
+        return None
+    try:
+        return _get_pool().getconn()
+    except (psycopg2.OperationalError, psycopg2.pool.PoolError) as e:
+        _pool_slots.release()
+        print(f"[DB_ERROR] Could not get a pooled database connection: {e}")
+        return None
+
+def release_db_connection(conn):
+    """Returns a pooled connection; an open transaction is rolled back and a broken connection discarded."""
+    try:
+        _get_pool().putconn(conn, close=bool(conn.closed))
+    finally:
+        _pool_slots.release()
+
+@contextmanager
+def db_conn():
+    """
+    Context manager around get_pooled_connection()/release_db_connection().
+    Yields None when no connection could be obtained.
+    """
+    conn = get_pooled_connection()
+    try:
+        yield conn
+    finally:
+        if conn is not None:
+            release_db_connection(conn)
+
 # --- Schema Management ---
+# Sort key for keyset pagination of extracted_data; rows without created_at sort as oldest.
+# Queries must use this exact expression so they can use the index below.
+CREATED_AT_SORT_KEY = "COALESCE(created_at, '-infinity'::timestamptz)"
+
 CREATE_TABLE_SQL = """
 CREATE TABLE IF NOT EXISTS extracted_data (
     id SERIAL PRIMARY KEY,
@@ -45,6 +119,8 @@ CREATE TABLE IF NOT EXISTS extracted_data (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     UNIQUE (document_id, index_name)
 );
+CREATE INDEX IF NOT EXISTS extracted_data_created_at_id_idx
+    ON extracted_data ((""" + CREATED_AT_SORT_KEY + """), id);
 """
 
 def create_table_if_not_exists(conn):
@@ -65,16 +141,8 @@ VALUES %s
 ON CONFLICT (document_id, index_name) DO NOTHING;
 """
 
-def insert_extracted_data(conn, company_name, company_results):
-    """
-    Inserts a batch of extracted data for a company into the database.
-
-    Args:
-        conn: The database connection object.
-        company_name (str): The name of the company being processed.
-        company_results (dict): The dictionary of results from the indexing worker.
-                                  e.g., {"doc1.pdf.json": {"value": "...", "page": ...}}
-    """
+def _extracted_data_records(company_name, company_results):
+    """Builds the INSERT_DATA_SQL rows for one company's worker results."""
     records_to_insert = []
     for doc_filename, result_data in company_results.items():
         # Skip if the result is null
@@ -105,17 +173,45 @@ def insert_extracted_data(conn, company_name, company_results):
             index_name,
             result_json
         ))
+    return records_to_insert
 
+def _insert_records(conn, records_to_insert, label):
+    """Inserts prepared rows with one execute_values call and commits."""
     if not records_to_insert:
-        print(f"[DB_INFO] No new data to insert for company {company_name}.")
+        print(f"[DB_INFO] No new data to insert for {label}.")
         return
 
     try:
         with conn.cursor() as cur:
             execute_values(cur, INSERT_DATA_SQL, records_to_insert)
             conn.commit()
-            print(f"[DB_INFO] Successfully inserted/updated {len(records_to_insert)} records for {company_name}.")
+            print(f"[DB_INFO] Successfully inserted/updated {len(records_to_insert)} records for {label}.")
     except Exception as e:
-        print(f"[DB_ERROR] Failed to insert data for {company_name}: {e}")
+        print(f"[DB_ERROR] Failed to insert data for {label}: {e}")
         conn.rollback()
 
+def insert_extracted_data(conn, company_name, company_results):
+    """
+    Inserts a batch of extracted data for a company into the database.
+
+    Args:
+        conn: The database connection object.
+        company_name (str): The name of the company being processed.
+        company_results (dict): The dictionary of results from the indexing worker.
+                                  e.g., {"doc1.pdf.json": {"value": "...", "page": ...}}
+    """
+    _insert_records(conn, _extracted_data_records(company_name, company_results), f"company {company_name}")
+
+def insert_extracted_data_for_companies(conn, results_by_company):
+    """
+    Inserts the extracted data of several companies in a single batch.
+
+    Args:
+        conn: The database connection object.
+        results_by_company (dict): {company_name: company_results}, each in the
+                                   format accepted by insert_extracted_data.
+    """
+    records_to_insert = []
+    for company_name, company_results in results_by_company.items():
+        records_to_insert.extend(_extracted_data_records(company_name, company_results))
+    _insert_records(conn, records_to_insert, f"{len(results_by_company)} companies")
@@ -1,6 +1,8 @@
 import os
 import json
 import time
+import threading
+from collections import OrderedDict
 
 # This file contains the core logic for the manual indexing process.
 
@@ -68,7 +70,36 @@ def _call_llm_for_extraction(page_text: str, index_name: str) -> str | None:
         print(f"      - ERROR: LLM API call failed. Error: {e}")
         return None
 
-from db_utils import get_db_connection, create_table_if_not_exists, insert_extracted_data
+from db_utils import db_conn, create_table_if_not_exists, insert_extracted_data
+
+# Parsed OCR cache files, keyed by path and validated against (mtime_ns, size), so a
+# document back-filled for several indexes is read and parsed once, not once per index
+OCR_PAGES_CACHE_SIZE = 32
+_ocr_pages_cache = OrderedDict()
+_ocr_pages_cache_lock = threading.Lock()
+
+def load_ocr_pages(cache_path: str):
+    """
+    Returns the parsed pages of an OCR cache file, re-reading it only if it changed.
+    Raises FileNotFoundError if the file does not exist. Callers must not modify the result.
+    """
+    st = os.stat(cache_path)
+    key = (st.st_mtime_ns, st.st_size)
+    with _ocr_pages_cache_lock:
+        cached = _ocr_pages_cache.get(cache_path)
+        if cached is not None and cached[0] == key:
+            _ocr_pages_cache.move_to_end(cache_path)
+            return cached[1]
+
+    with open(cache_path, 'r', encoding='utf-8') as f:
+        ocr_pages = json.load(f)
+
+    with _ocr_pages_cache_lock:
+        _ocr_pages_cache[cache_path] = (key, ocr_pages)
+        _ocr_pages_cache.move_to_end(cache_path)
+        while len(_ocr_pages_cache) > OCR_PAGES_CACHE_SIZE:
+            _ocr_pages_cache.popitem(last=False)
+    return ocr_pages
 
 def index_single_document(company_name: str, file_name: str, index_name: str, status_callback=None):
     """
@@ -82,11 +113,9 @@ def index_single_document(company_name: str, file_name: str, index_name: str, st
         project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         cache_path = os.path.join(project_root, "backend", "ocr_cache", company_name, f"{file_name}.json")
         
-        ocr_pages = []
-        if os.path.exists(cache_path):
-            with open(cache_path, 'r', encoding='utf-8') as f:
-                ocr_pages = json.load(f)
-        else:
+        try:
+            ocr_pages = load_ocr_pages(cache_path)
+        except FileNotFoundError:
             if status_callback:
                 status_callback(f"  - WARNING: OCR cache not found for {file_name}. Skipping structured index.")
             return
@@ -108,26 +137,20 @@ def index_single_document(company_name: str, file_name: str, index_name: str, st
                 break # Early stopping
 
         # 3. Prepare data and insert into the database
-        from db_utils import get_db_connection, insert_extracted_data
+        with db_conn() as conn:
+            # Only insert if we found the index
+            if conn and extracted_value is not None:
+                result_data = {
+                    "value": extracted_value,
+                    "page": found_on_page,
+                    "index_name": index_name
+                }
 
-        conn = get_db_connection()
-        if conn:
-            try:
-                # Only insert if we found the index
-                if extracted_value is not None:
-                    result_data = {
-                        "value": extracted_value,
-                        "page": found_on_page,
-                        "index_name": index_name
-                    }
-
-                    company_results_for_db = {
-                        file_name: result_data
-                    }
-
-                    insert_extracted_data(conn, company_name, company_results_for_db)
-            finally:
-                conn.close()
+                company_results_for_db = {
+                    file_name: result_data
+                }
+
+                insert_extracted_data(conn, company_name, company_results_for_db)
 
     except Exception as e:
         error_message = f"  - ERROR: Failed during structured indexing for {file_name}. Error: {e}"
@@ -135,10 +158,12 @@ def index_single_document(company_name: str, file_name: str, index_name: str, st
             status_callback(error_message)
         print(error_message)
 
-def index_company_worker(company_name: str, index_name: str, output_file_path: str, lock, status_callback=None):
+def index_company_worker(company_name: str, index_name: str, status_callback=None, save_to_db=True):
     """
     A thread-safe worker function that processes all documents for a single company
-    and saves the results directly to the PostgreSQL database.
+    and saves the results to the PostgreSQL database in one insert.
+    The {file_name: result} dict is returned as well; with save_to_db=False nothing
+    is written, so the caller can insert many companies' results in one batch.
     """
     if status_callback:
         status_callback(f"START: Worker for company: {company_name}")
@@ -148,11 +173,15 @@ def index_company_worker(company_name: str, index_name: str, output_file_path: s
         project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         company_cache_dir = os.path.join(project_root, "backend", "ocr_cache", company_name)
 
-        if not os.path.isdir(company_cache_dir):
+        # scandir reports entry types from the directory read itself, so there is
+        # no separate isdir/stat call for the directory or its entries
+        try:
+            with os.scandir(company_cache_dir) as entries:
+                document_files = [entry.name for entry in entries if entry.name.endswith('.json') and entry.is_file()]
+        except (FileNotFoundError, NotADirectoryError):
             status_callback(f"ERROR: Cache directory not found for company '{company_name}'. Skipping.")
             return
 
-        document_files = [f for f in os.listdir(company_cache_dir) if f.endswith('.json')]
         if not document_files:
             status_callback(f"INFO: No OCR cache files found for company '{company_name}'.")
             return
@@ -165,11 +194,9 @@ def index_company_worker(company_name: str, index_name: str, output_file_path: s
         for doc_filename in document_files:
             cache_path = os.path.join(company_cache_dir, doc_filename)
             try:
-                with open(cache_path, 'r', encoding='utf-8') as f:
-                    ocr_pages = json.load(f)
+                ocr_pages = load_ocr_pages(cache_path)
             except Exception as e:
                 status_callback(f"  - WARNING: Could not read or parse JSON file {doc_filename} for {company_name}. Skipping. Error: {e}")
-                company_results[doc_filename] = None
                 continue
 
             extracted_value = None
@@ -201,18 +228,20 @@ def index_company_worker(company_name: str, index_name: str, output_file_path: s
                     "index_name": index_name
                 }
 
+        if not save_to_db:
+            return company_results
+
         # --- Database Insertion Step ---
-        conn = get_db_connection()
-        if conn:
-            try:
+        with db_conn() as conn:
+            if conn:
                 # Ensure the table exists
                 create_table_if_not_exists(conn)
 
                 # Insert individual document results (only for found indexes)
                 insert_extracted_data(conn, company_name, company_results)
-            finally:
-                conn.close()
-                print(f"[DB_INFO] Database connection closed for {company_name}.")
+            else:
+                print(f"[DB_ERROR] Could not connect to DB to save results for {company_name}.")
+        return company_results
 
     except Exception as e:
         if status_callback:
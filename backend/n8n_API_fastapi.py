@@ -1,4 +1,5 @@
 import os
+import hmac
 import requests
 from fastapi import FastAPI, HTTPException, Header, Query, BackgroundTasks, Depends
 from fastapi.middleware.cors import CORSMiddleware
@@ -189,7 +190,8 @@ async def verify_api_key(authorization: Optional[str] = Header(None)):
             )
 
         token = authorization.split(" ")[1]
-        if token != N8N_API_KEY:
+        # Constant-time comparison; bytes so non-ASCII input can't raise TypeError
+        if not hmac.compare_digest(token.encode("utf-8"), N8N_API_KEY.encode("utf-8")):
             raise HTTPException(status_code=401, detail="Invalid API Key")
 
     return True
@@ -275,17 +277,6 @@ async def create_index_endpoint(
 
     def job_orchestrator(job_id, index_name):
         """Discovers companies and launches a worker thread for each."""
-        # Define the central output file
-        output_file_path = os.path.join(
-            project_root, "backend", "indexing_results.json"
-        )
-        # Create a shared lock for file access
-        file_lock = threading.RLock()
-
-        # Clear the old results file at the start of a new job
-        if os.path.exists(output_file_path):
-            os.remove(output_file_path)
-
         def status_callback(message):
             # Add a timestamp to the message for clearer logging on the server
             print(f"[INDEXING_STATUS] [{job_id}] {message}")
@@ -380,8 +371,6 @@ async def create_index_endpoint(
                     args=(
                         company_name,
                         index_name,
-                        output_file_path,
-                        file_lock,
                         create_doc_callback(company_name),
                     ),
                 )